@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+###############################################################################
+# Script      : bench_project_pagination.py
+# Description : Full project listing vs. keyset pages for an owner with 100k projects
+###############################################################################
+"""
+Seeds a throwaway owner with many projects in the migrated database at DATABASE_URL, times the
+old full listing against keyset pages (first and deepest) and an OFFSET page, prints the executed plan of
+the keyset query and removes the seeded rows again.
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_project_pagination --projects 100000
+"""
+
+# Imports
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+OWNER = "benchpagination"
+# Owns four times as many projects so the owner filter is selective, as in a shared table
+OTHER_SHARE = 4
+OTHER_OWNER = "benchpagination-other"
+PAGE = 50
+
+FULL_LISTING = "SELECT * FROM projects WHERE owner = :owner"
+KEYSET_FIRST = "SELECT * FROM projects WHERE owner = :owner ORDER BY id DESC LIMIT :limit"
+KEYSET_AFTER = "SELECT * FROM projects WHERE owner = :owner AND id < :before_id ORDER BY id DESC LIMIT :limit"
+OFFSET_PAGE = "SELECT * FROM projects WHERE owner = :owner ORDER BY id DESC OFFSET :offset LIMIT :limit"
+
+
+async def seed(conn, projects):
+    for owner in (OWNER, OTHER_OWNER):
+        await conn.execute(text("""
+            INSERT INTO users (first_name, last_name, username, email, hashed_password, confirmed)
+            VALUES ('Bench', 'Marker', :owner, :email, 'x', false)
+        """), {"owner": owner, "email": f"{owner}@example.com"})
+    # Interleave both owners' rows like concurrent sign-ups would
+    await conn.execute(text("""
+        INSERT INTO projects (project_name, project_summary, owner, created_at, updated_at)
+        SELECT 'Project ' || n, 'Summary of benchmark project ' || n,
+               CASE WHEN n % (:other_share + 1) = 0 THEN :owner ELSE :other_owner END, now(), now()
+        FROM generate_series(1, :projects * (:other_share + 1)) AS n
+    """), {"owner": OWNER, "other_owner": OTHER_OWNER, "other_share": OTHER_SHARE, "projects": projects})
+    await conn.execute(text("ANALYZE projects"))
+
+
+async def cleanup(conn):
+    for owner in (OWNER, OTHER_OWNER):
+        await conn.execute(text("DELETE FROM projects WHERE owner = :owner"), {"owner": owner})
+        await conn.execute(text("DELETE FROM users WHERE username = :owner"), {"owner": owner})
+
+
+async def timed(conn, statement, params, runs):
+    samples, payload = [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = (await conn.execute(text(statement), params)).mappings().all()
+        payload = len(json.dumps([dict(row) for row in rows], default=str))
+        samples.append(time.perf_counter() - start)
+
+    return {"median_ms": round(statistics.median(samples) * 1000, 2), "rows": len(rows), "payload_bytes": payload}
+
+
+async def main(projects, runs):
+    engine = create_async_engine(os.environ.get("DATABASE_URL"), echo=False)
+    try:
+        async with engine.begin() as conn:
+            await seed(conn, projects)
+
+        async with engine.connect() as conn:
+            smallest = (await conn.execute(text("SELECT min(id) FROM projects WHERE owner = :owner"),
+                                           {"owner": OWNER})).scalar_one()
+            params = {"owner": OWNER, "limit": PAGE}
+            results = {
+                "full_listing": await timed(conn, FULL_LISTING, {"owner": OWNER}, runs),
+                "keyset_first_page": await timed(conn, KEYSET_FIRST, params, runs),
+                "keyset_last_page": await timed(conn, KEYSET_AFTER, {**params, "before_id": smallest + (OTHER_SHARE + 1) * PAGE}, runs),
+                "offset_last_page": await timed(conn, OFFSET_PAGE, {**params, "offset": projects - PAGE}, runs)
+            }
+            plan = (await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {KEYSET_AFTER}"),
+                                       {**params, "before_id": smallest + (OTHER_SHARE + 1) * PAGE})).scalars().all()
+
+        print(json.dumps({"projects": projects, "page_size": PAGE, "results": results, "keyset_plan": plan}, indent=2))
+    finally:
+        async with engine.begin() as conn:
+            await cleanup(conn)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.projects, args.runs))
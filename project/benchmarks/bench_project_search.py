@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+###############################################################################
+# Script      : bench_project_search.py
+# Description : Indexed full-text project search vs. ILIKE on a large synthetic dataset
+###############################################################################
+"""
+Seeds a throwaway owner with many projects of generated names and summaries in the migrated database at
+DATABASE_URL, times the ranked full-text search against an ILIKE scan for the same word, prints the
+executed plan of the search and removes the seeded rows again.
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_project_search --projects 200000
+"""
+
+# Imports
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+OWNER = "benchsearch"
+# Filler vocabulary, RARE_WORD lands in one summary out of every RARE_EVERY
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet",
+         "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango"]
+RARE_WORD = "zeppelin"
+RARE_EVERY = 1000
+PAGE = 20
+
+SEARCH = """
+    SELECT id, project_name, ts_rank_cd(search_vector, query) AS rank
+    FROM projects, websearch_to_tsquery('english'::regconfig, :terms) AS query
+    WHERE owner = :owner AND search_vector @@ query
+    ORDER BY rank DESC, id DESC
+    LIMIT :limit
+"""
+ILIKE = """
+    SELECT id, project_name
+    FROM projects
+    WHERE owner = :owner AND (project_name ILIKE :pattern OR project_summary ILIKE :pattern)
+    ORDER BY id DESC
+    LIMIT :limit
+"""
+
+
+async def seed(conn, projects):
+    await conn.execute(text("""
+        INSERT INTO users (first_name, last_name, username, email, hashed_password, confirmed)
+        VALUES ('Bench', 'Marker', :owner, :email, 'x', false)
+    """), {"owner": OWNER, "email": f"{OWNER}@example.com"})
+    await conn.execute(text("""
+        INSERT INTO projects (project_name, project_summary, owner, created_at, updated_at)
+        SELECT 'Project ' || (CAST(:words AS VARCHAR[]))[1 + n % 20] || ' ' || n,
+               'Plans for ' || (CAST(:words AS VARCHAR[]))[1 + (n / 20) % 20] || ' and ' || (CAST(:words AS VARCHAR[]))[1 + (n / 400) % 20] ||
+               CASE WHEN n % :rare_every = 0 THEN ' with a ' || CAST(:rare_word AS VARCHAR) ELSE '' END,
+               :owner, now(), now()
+        FROM generate_series(1, :projects) AS n
+    """), {"owner": OWNER, "projects": projects, "words": WORDS, "rare_word": RARE_WORD, "rare_every": RARE_EVERY})
+    await conn.execute(text("ANALYZE projects"))
+
+
+async def cleanup(conn):
+    await conn.execute(text("DELETE FROM projects WHERE owner = :owner"), {"owner": OWNER})
+    await conn.execute(text("DELETE FROM users WHERE username = :owner"), {"owner": OWNER})
+
+
+async def timed(conn, statement, params, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = (await conn.execute(text(statement), params)).all()
+        samples.append(time.perf_counter() - start)
+
+    return {"median_ms": round(statistics.median(samples) * 1000, 2), "rows": len(rows)}
+
+
+async def main(projects, runs):
+    engine = create_async_engine(os.environ.get("DATABASE_URL"), echo=False)
+    try:
+        async with engine.begin() as conn:
+            await seed(conn, projects)
+
+        async with engine.connect() as conn:
+            results = {}
+            for word in (RARE_WORD, WORDS[0]):
+                results[word] = {
+                    "search": await timed(conn, SEARCH, {"owner": OWNER, "terms": word, "limit": PAGE}, runs),
+                    "ilike": await timed(conn, ILIKE, {"owner": OWNER, "pattern": f"%{word}%", "limit": PAGE}, runs)
+                }
+            plan = (await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {SEARCH}"),
+                                       {"owner": OWNER, "terms": RARE_WORD, "limit": PAGE})).scalars().all()
+
+        print(json.dumps({"projects": projects, "page_size": PAGE, "results": results, "search_plan": plan},
+                         indent=2))
+    finally:
+        async with engine.begin() as conn:
+            await cleanup(conn)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.projects, args.runs))
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+###############################################################################
+# Script      : bench_serialization.py
+# Description : Per-endpoint cost of turning query results into response bodies
+###############################################################################
+"""
+Times, without a database or server, how long each endpoint's payload takes to serialize:
+
+    before         - jsonable_encoder over the ORM object or row dicts, then json.dumps (JSONResponse)
+    response_model - the row converted to the endpoint's response model, then FastAPI's response_model
+                     validation, jsonable_encoder and orjson (ORJSONResponse), as the write endpoints run
+    rendered       - the row converted to the response model and rendered straight to orjson, as the
+                     cache decorator renders a miss and ModelResponse renders a search page
+
+    python -m benchmarks.bench_serialization --runs 2000
+"""
+
+# Imports
+import argparse
+import asyncio
+import datetime
+import json
+import orjson
+import statistics
+import time
+from collections import namedtuple
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+# Custom Imports
+from example_com.data.account.users import User
+from example_com.infrastructure.serialization import render_json
+from example_com.models.project_schema import ProjectPage, ProjectResponse, ProjectSearchPage, ProjectSearchResult
+from example_com.models.user_schema import UserResponse
+
+NOW = datetime.datetime(2021, 9, 15, 12, 30, 45, 123456)
+
+ProjectRow = namedtuple("ProjectRow", ["id", "project_name", "project_summary", "owner", "created_at",
+                                       "updated_at", "version", "members"])
+SearchRow = namedtuple("SearchRow", ProjectRow._fields + ("rank",))
+
+
+def user():
+    return User(id=1, first_name="Bench", last_name="Marker", username="benchmarker",
+                email="benchmarker@example.com", hashed_password="$6$rounds=184597$" + "x" * 86,
+                profile_image_url=None, confirmed=False, confirmed_on=None, created_at=NOW, updated_at=NOW,
+                last_login=NOW, is_admin=False)
+
+
+def project_rows(count):
+    return [ProjectRow(id=n, project_name=f"Project {n}", project_summary=f"Summary of benchmark project {n}",
+                       owner="benchmarker", created_at=NOW, updated_at=NOW, version=1,
+                       members=["alice", "bob", "carol"]) for n in range(count)]
+
+
+def search_rows(count):
+    return [SearchRow(*row, rank=0.5) for row in project_rows(count)]
+
+
+def endpoints():
+    """ Per endpoint: the old payload, the row(s) and how the endpoint builds its response model from them """
+    account = user()
+    page, big_page, matches, one = project_rows(50), project_rows(200), search_rows(20), project_rows(1)[0]
+
+    return {
+        "GET /api/account": (
+            account, UserResponse, lambda: UserResponse.from_row(account)),
+        "GET /api/workspaces/projects/{id}": (
+            one._asdict(), ProjectResponse, lambda: ProjectResponse.from_row(one)),
+        "GET /api/workspaces/projects?limit=50": (
+            {"projects": [row._asdict() for row in page], "next_cursor": "NTA="}, ProjectPage,
+            lambda: ProjectPage(projects=[ProjectResponse.from_row(row) for row in page], next_cursor="NTA=")),
+        "GET /api/workspaces/projects?limit=200": (
+            {"projects": [row._asdict() for row in big_page], "next_cursor": "MjAw"}, ProjectPage,
+            lambda: ProjectPage(projects=[ProjectResponse.from_row(row) for row in big_page], next_cursor="MjAw")),
+        "GET /api/workspaces/projects/search": (
+            {"projects": [row._asdict() for row in matches], "next_offset": 20}, ProjectSearchPage,
+            lambda: ProjectSearchPage(projects=[ProjectSearchResult.from_row(row) for row in matches],
+                                      next_offset=20)),
+    }
+
+
+async def timed(render, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        body = render()
+        if asyncio.iscoroutine(body):
+            body = await body
+        samples.append(time.perf_counter() - start)
+
+    return {"median_us": round(statistics.median(samples) * 1_000_000, 1), "bytes": len(body)}
+
+
+async def main(runs):
+    results = {}
+    for name, (payload, model, build) in endpoints().items():
+        field = create_response_field(name=f"Response_{model.__name__}", type_=model)
+
+        async def through_response_model():
+            content = await serialize_response(field=field, response_content=build(), is_coroutine=True)
+            return ORJSONResponse(content=content).body
+
+        results[name] = {
+            "before": await timed(lambda: JSONResponse(content=jsonable_encoder(payload)).body, runs),
+            "response_model": await timed(through_response_model, runs),
+            "rendered": await timed(lambda: render_json(build()), runs)
+        }
+
+    # The export writes one line per row, 500 rows per batch
+    batch = [row._asdict() for row in project_rows(500)]
+    results["GET /api/workspaces/projects/export (500 rows)"] = {
+        "before": await timed(lambda: "".join(json.dumps(jsonable_encoder(row)) + "\n" for row in batch).encode(),
+                              max(runs // 20, 10)),
+        "orjson": await timed(lambda: b"".join(orjson.dumps(row) + b"\n" for row in batch), max(runs // 20, 10))
+    }
+
+    print(json.dumps({"runs": runs, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.runs))
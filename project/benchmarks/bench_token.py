@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+###############################################################################
+# Script      : bench_token.py
+# Description : Concurrent /api/token throughput, hashing inline vs. in a process pool
+###############################################################################
+"""
+Start the API once per mode and point the benchmark at it:
+
+    HASH_POOL_WORKERS=0 uvicorn example_com.app:app --port 5000    # before: hashing on the event loop
+    python -m benchmarks.bench_token --url http://localhost:5000
+
+    HASH_POOL_WORKERS=4 uvicorn example_com.app:app --port 5000    # after: hashing in the process pool
+    python -m benchmarks.bench_token --url http://localhost:5000
+
+While logins run, a probe request to a cheap endpoint measures how long the event loop stays blocked.
+"""
+
+# Imports
+import argparse
+import json
+import requests
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def register(url, username, password):
+    new_user = {
+        "first_name": "Bench",
+        "last_name": "Marker",
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": password
+    }
+    requests.post(f"{url}/api/account/register", data=json.dumps(new_user))
+
+
+def login(url, username, password):
+    start = time.perf_counter()
+    response = requests.post(f"{url}/api/token", data={"username": username, "password": password})
+    return response.status_code, time.perf_counter() - start
+
+
+def probe(url, path, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        requests.get(f"{url}{path}")
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--username", default="benchtoken")
+    parser.add_argument("--password", default="B3nchmark!pass")
+    parser.add_argument("--probe", default="/openapi.json", help="Cheap endpoint used to detect a blocked event loop")
+    args = parser.parse_args()
+
+    register(args.url, args.username, args.password)
+
+    stop, probe_samples = threading.Event(), []
+    prober = threading.Thread(target=probe, args=(args.url, args.probe, stop, probe_samples), daemon=True)
+    prober.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: login(args.url, args.username, args.password), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    prober.join()
+
+    latencies = [latency for status, latency in results if status == 200]
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print(json.dumps({
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "statuses": statuses,
+        "token_requests_per_sec": round(len(latencies) / elapsed, 2),
+        "token_latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1)
+        },
+        "probe_latency_ms": {
+            "p50": round(percentile(probe_samples, 50) * 1000, 1),
+            "p99": round(percentile(probe_samples, 99) * 1000, 1),
+            "max": round(max(probe_samples, default=0) * 1000, 1)
+        }
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
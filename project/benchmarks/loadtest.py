@@ -0,0 +1,396 @@
+#!/usr/bin/python3
+###############################################################################
+# Script      : loadtest.py
+# Description : Fixed-concurrency load test of the admin, accounts and projects routers
+###############################################################################
+"""
+Starts the API from create_app() in its own process against the Postgres at DATABASE_URL and a redis,
+seeds users and projects, then drives a weighted mix of requests across the admin, accounts and projects
+routers at a fixed concurrency. Requests/sec and p50/p95/p99 per route are written to a JSON file. Pass an
+earlier file as --baseline to compare against it; the run exits with 1 when a route regressed.
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.loadtest --fake-redis --output baseline.json
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.loadtest --fake-redis --baseline baseline.json
+
+The app needs example_com/settings.json as usual. --fake-redis runs an in-memory redis stand-in
+(pip install "fakeredis[lua]") instead of the one at REDIS_URL. Set PASSWORD_ROUNDS low to keep seeding fast.
+Seeded rows are removed at the end.
+"""
+
+# Imports
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import requests
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+USER_PREFIX = "loadtest"
+PASSWORD = "L0adtest!pass"
+WORDS = ["alpha", "billing", "cluster", "dashboard", "export", "gateway", "inventory", "migration", "payments",
+         "reporting", "search", "telemetry"]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+###############################################################################
+# Stand-ins and Server
+###############################################################################
+def serve_fake_redis(port):
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit('--fake-redis needs fakeredis, pip install "fakeredis[lua]"')
+
+    TcpFakeServer(("127.0.0.1", port), server_type="redis").serve_forever()
+
+
+def serve_app(port):
+    import uvicorn
+    from example_com.app import create_app
+
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+def wait_until_ready(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/health/ready").status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.25)
+
+    raise RuntimeError(f"The API at {url} did not become ready within {timeout} seconds")
+
+
+###############################################################################
+# Seed Data
+###############################################################################
+class BenchUser:
+    def __init__(self, username, token):
+        self.username = username
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.projects = []
+
+
+def seed(url, database_url, users, projects):
+    seeded = []
+    for i in range(users):
+        username = f"{USER_PREFIX}{i}"
+        requests.post(f"{url}/api/account/register", data=json.dumps({
+            "first_name": "Load", "last_name": "Tester", "username": username,
+            "email": f"{username}@example.com", "password": PASSWORD
+        }))
+        if i == 0:
+            # Before its first request, so no cached principal is missing the flag
+            asyncio.run(grant_admin(database_url, username))
+        response = requests.post(f"{url}/api/token", data={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        user = BenchUser(username, response.json()["access_token"])
+
+        rnd = random.Random(i)
+        for start in range(0, projects, 500):
+            batch = [{"project_name": f"Project {n}",
+                      "project_summary": " ".join(rnd.sample(WORDS, 3)) + f" project {n}"}
+                     for n in range(start, min(start + 500, projects))]
+            requests.post(f"{url}/api/workspaces/projects/bulk", data=json.dumps(batch), headers=user.headers)
+
+        cursor = None
+        while True:
+            page = requests.get(f"{url}/api/workspaces/projects", params={"limit": 200, "cursor": cursor},
+                                headers={**user.headers, "Cache-Control": "no-store"}).json()
+            user.projects.extend((project["id"], project["project_name"]) for project in page["projects"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        seeded.append(user)
+
+    return seeded
+
+
+async def grant_admin(database_url, username):
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("UPDATE users SET is_admin = true WHERE username = :username"),
+                               {"username": username})
+    finally:
+        await engine.dispose()
+
+
+async def cleanup(database_url):
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.begin() as conn:
+            pattern = {"pattern": f"{USER_PREFIX}%"}
+            await conn.execute(text("DELETE FROM projects WHERE owner LIKE :pattern"), pattern)
+            await conn.execute(text("DELETE FROM users WHERE username LIKE :pattern"), pattern)
+    finally:
+        await engine.dispose()
+
+
+###############################################################################
+# Request Mix
+###############################################################################
+def get_account(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/api/account", headers=user.headers)
+
+
+def update_account(session, url, user, admin, users, rnd):
+    return session.put(f"{url}/api/account/{user.username}", headers=user.headers,
+                       data=json.dumps({"first_name": rnd.choice(["Load", "Stress"]), "last_name": "Tester"}))
+
+
+def login(session, url, user, admin, users, rnd):
+    return session.post(f"{url}/api/token", data={"username": user.username, "password": PASSWORD})
+
+
+def list_projects(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/api/workspaces/projects", params={"limit": 50}, headers=user.headers)
+
+
+def get_project(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/api/workspaces/projects/{rnd.choice(user.projects)[0]}", headers=user.headers)
+
+
+def search_projects(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/api/workspaces/projects/search", params={"q": rnd.choice(WORDS)},
+                       headers=user.headers)
+
+
+def export_projects(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/api/workspaces/projects/export", headers=user.headers)
+
+
+def update_project(session, url, user, admin, users, rnd):
+    id, name = rnd.choice(user.projects)
+    return session.put(f"{url}/api/workspaces/projects/{id}", headers=user.headers,
+                       data=json.dumps({"project_name": name, "project_summary": " ".join(rnd.sample(WORDS, 3))}))
+
+
+def upsert_project(session, url, user, admin, users, rnd):
+    _, name = rnd.choice(user.projects)
+    return session.put(f"{url}/api/workspaces/projects/by-name/{name}", headers=user.headers,
+                       data=json.dumps({"project_summary": " ".join(rnd.sample(WORDS, 3))}))
+
+
+def add_member(session, url, user, admin, users, rnd):
+    return session.post(f"{url}/api/workspaces/projects/{rnd.choice(user.projects)[0]}/members",
+                        headers=user.headers, data=json.dumps({"username": rnd.choice(users).username}))
+
+
+def remove_member(session, url, user, admin, users, rnd):
+    return session.delete(f"{url}/api/workspaces/projects/{rnd.choice(user.projects)[0]}/members/"
+                          f"{rnd.choice(users).username}", headers=user.headers)
+
+
+def admin_settings(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/api/admin/settings", headers=admin.headers)
+
+
+def admin_db_pool(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/api/admin/db-pool", headers=admin.headers)
+
+
+def admin_response_cache(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/api/admin/response-cache", headers=admin.headers)
+
+
+def readiness(session, url, user, admin, users, rnd):
+    return session.get(f"{url}/health/ready")
+
+
+# Route, weight in the mix, request and the statuses that count as success
+MIX = [
+    ("GET /api/account", 20, get_account, {200}),
+    ("PUT /api/account/{username}", 2, update_account, {200}),
+    ("POST /api/token", 1, login, {200}),
+    ("GET /api/workspaces/projects", 15, list_projects, {200}),
+    ("GET /api/workspaces/projects/{id}", 20, get_project, {200}),
+    ("GET /api/workspaces/projects/search", 8, search_projects, {200}),
+    ("GET /api/workspaces/projects/export", 1, export_projects, {200}),
+    ("PUT /api/workspaces/projects/{id}", 4, update_project, {200}),
+    ("PUT /api/workspaces/projects/by-name/{project_name}", 2, upsert_project, {200}),
+    ("POST /api/workspaces/projects/{id}/members", 2, add_member, {200, 201}),
+    ("DELETE /api/workspaces/projects/{id}/members/{username}", 2, remove_member, {204, 404}),
+    ("GET /api/admin/settings", 3, admin_settings, {200}),
+    ("GET /api/admin/db-pool", 1, admin_db_pool, {200}),
+    ("GET /api/admin/response-cache", 1, admin_response_cache, {200}),
+    ("GET /health/ready", 2, readiness, {200}),
+]
+
+
+def worker(index, url, users, seed_value, warmup_until, stop_at, samples, lock):
+    rnd = random.Random(seed_value + index)
+    session = requests.Session()
+    routes = [route for route in MIX]
+    weights = [route[1] for route in MIX]
+    local = []
+
+    while time.monotonic() < stop_at:
+        name, _, send, expected = rnd.choices(routes, weights)[0]
+        start = time.monotonic()
+        try:
+            ok = send(session, url, rnd.choice(users), users[0], users, rnd).status_code in expected
+        except requests.RequestException:
+            ok = False
+        if start >= warmup_until:
+            local.append((name, time.monotonic() - start, ok))
+
+    with lock:
+        samples.extend(local)
+
+
+def run(url, users, concurrency, duration, warmup, seed_value):
+    samples, lock = [], threading.Lock()
+    warmup_until = time.monotonic() + warmup
+    stop_at = warmup_until + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index in range(concurrency):
+            pool.submit(worker, index, url, users, seed_value, warmup_until, stop_at, samples, lock)
+
+    return samples
+
+
+###############################################################################
+# Report
+###############################################################################
+def summarize(latencies, errors, duration):
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "requests_per_sec": round((len(latencies) + errors) / duration, 2),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2)
+        }
+    }
+
+
+def report(samples, duration, meta):
+    routes = {}
+    for name, _, _, _ in MIX:
+        latencies = [latency for route, latency, ok in samples if route == name and ok]
+        errors = sum(1 for route, _, ok in samples if route == name and not ok)
+        routes[name] = summarize(latencies, errors, duration)
+
+    total = summarize([latency for _, latency, ok in samples if ok], sum(1 for *_, ok in samples if not ok),
+                      duration)
+
+    return {"meta": meta, "total": total, "routes": routes}
+
+
+def compare(result, baseline, tolerance, min_delta_ms):
+    """ Print how each route moved against the baseline, returns the regressions """
+    regressions = []
+    rows = [("total", result["total"], baseline.get("total"))]
+    rows += [(name, stats, baseline.get("routes", {}).get(name)) for name, stats in result["routes"].items()]
+
+    print(f"{'route':<58}{'rps':>10}{'base':>10}{'p99 ms':>10}{'base':>10}", file=sys.stderr)
+    for name, stats, base in rows:
+        if not base or not stats["requests"]:
+            continue
+
+        p99, base_p99 = stats["latency_ms"]["p99"], base["latency_ms"]["p99"]
+        rps, base_rps = stats["requests_per_sec"], base["requests_per_sec"]
+        print(f"{name:<58}{rps:>10.1f}{base_rps:>10.1f}{p99:>10.1f}{base_p99:>10.1f}", file=sys.stderr)
+
+        # Tiny latencies jitter by more than the tolerance, a regression also has to cost min_delta_ms
+        if p99 > base_p99 * (1 + tolerance) and p99 - base_p99 > min_delta_ms:
+            regressions.append(f"{name}: p99 {base_p99} ms -> {p99} ms")
+        if name == "total" and rps < base_rps * (1 - tolerance):
+            regressions.append(f"{name}: {base_rps} -> {rps} requests/sec")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds run before measuring")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--projects", type=int, default=200, help="Projects per user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fake-redis", action="store_true", help="Use an in-memory redis stand-in")
+    parser.add_argument("--output", default="loadtest.json")
+    parser.add_argument("--baseline", help="Result of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative p99/throughput change")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        sys.exit("Set DATABASE_URL to a local Postgres database")
+
+    from example_com.data.migrate import run_migrations
+    asyncio.run(run_migrations(database_url))
+
+    processes = []
+    if args.fake_redis:
+        redis_port = free_port()
+        os.environ["REDIS_URL"] = f"redis://127.0.0.1:{redis_port}"
+        processes.append(multiprocessing.Process(target=serve_fake_redis, args=(redis_port,), daemon=True))
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    processes.append(multiprocessing.Process(target=serve_app, args=(port,)))
+
+    try:
+        for process in processes:
+            process.start()
+        wait_until_ready(url)
+
+        users = seed(url, database_url, args.users, args.projects)
+
+        samples = run(url, users, args.concurrency, args.duration, args.warmup, args.seed)
+        result = report(samples, args.duration, {
+            "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+            "users": args.users, "projects_per_user": args.projects, "seed": args.seed,
+            "fake_redis": args.fake_redis
+        })
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+        asyncio.run(cleanup(database_url))
+
+    with open(args.output, "w") as fout:
+        json.dump(result, fout, indent=2)
+    print(json.dumps(result["total"], indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as fin:
+            regressions = compare(result, json.load(fin), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
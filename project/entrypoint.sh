@@ -8,4 +8,8 @@ done
 
 echo "PostgreSQL started"
 
-gunicorn -b 0.0.0.0:5000 example_com.app:app -k uvicorn.workers.UvicornWorker
+if [ "$RUN_MIGRATIONS" = "1" ]; then
+    python -m example_com.data.migrate
+fi
+
+gunicorn -c gunicorn.conf.py example_com.app:app
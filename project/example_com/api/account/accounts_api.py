@@ -1,19 +1,23 @@
 # Imports
 import fastapi
 from fastapi import Depends
-from fastapi_cache import JsonCoder
-from fastapi_cache.decorator import cache
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
 from starlette.responses import Response
 # Custom Imports
 from example_com.data.account.users import User
+from example_com.infrastructure.cache import cache
+from example_com.infrastructure.cache_tags import user_tag
+from example_com.infrastructure.conditional import is_not_modified, not_modified, set_validators, timestamp_etag
 from example_com.infrastructure.jwt_token_auth import get_current_user, set_token
-from example_com.models.user_schema import BaseUserSchema, FullUserSchema, ResetPasswordSchema
+from example_com.infrastructure.unit_of_work import UnitOfWorkRoute, after_commit, get_session, record_write
+from example_com.models.user_schema import BaseUserSchema, FullUserSchema, ResetPasswordSchema, TokenResponse, \
+    UserResponse
 from example_com.models.validation import ValidationError, no_dups_validation
 from example_com.services import user_service
 
-router = fastapi.APIRouter()
+router = fastapi.APIRouter(route_class=UnitOfWorkRoute)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
@@ -21,11 +25,23 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 ###############################################################################
 # Account Index
 ###############################################################################
-@router.get("/api/account")
-#@cache(expire=7200, coder=JsonCoder, namespace="acct-index")
+@router.get("/api/account", response_model=UserResponse)
+@cache(expire=7200, namespace="acct-index",
+       tags=lambda kwargs: [user_tag(kwargs["current_user"].username)])
 async def account_index(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     try:
-        return current_user
+        # get_current_user hands back its 401 response for an invalid token
+        if isinstance(current_user, Response):
+            return current_user
+
+        # The principal is already loaded for authentication, revalidating costs no query
+        etag = timestamp_etag(current_user.updated_at)
+        if is_not_modified(request, etag, current_user.updated_at):
+            return not_modified(etag, current_user.updated_at)
+
+        set_validators(response, etag, current_user.updated_at)
+
+        return UserResponse.from_row(current_user)
 
     except ValidationError as ve:
         return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
@@ -37,15 +53,20 @@ async def account_index(request: Request, response: Response, current_user: User
 ###############################################################################
 # Register Account
 ###############################################################################
-@router.post("/api/account/register", status_code=201)
-async def register_account(new_user: FullUserSchema):
+@router.post("/api/account/register", status_code=201, response_model=UserResponse)
+async def register_account(new_user: FullUserSchema, session: AsyncSession = Depends(get_session)):
     try:
-        await no_dups_validation(new_user.username, new_user.email)
-        return await user_service.create_user(new_user.first_name,
+        await no_dups_validation(session, new_user.username, new_user.email)
+        user = await user_service.create_user(session,
+                                              new_user.first_name,
                                               new_user.last_name,
                                               new_user.username,
                                               new_user.email,
                                               new_user.password)
+        # Nobody is authenticated yet, so the route can't tell whose reads have to stay on the primary
+        after_commit(session, lambda: record_write(user.username))
+
+        return UserResponse.from_row(user)
     except ValidationError as ve:
         return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
     except Exception as ex:
@@ -56,20 +77,17 @@ async def register_account(new_user: FullUserSchema):
 ###############################################################################
 # Login Account
 ###############################################################################
-@router.post("/api/token")
-async def login_account(form_data: OAuth2PasswordRequestForm = Depends()):
+@router.post("/api/token", response_model=TokenResponse)
+async def login_account(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)):
     try:
-        user = await user_service.find_user_by_username(form_data.username)
+        user = await user_service.login_user(session, form_data.username, form_data.password)
         if not user:
             raise ValidationError(error_msg="Incorrect username or password", status_code=400)
 
-        user_login_creds = await user_service.login_user(form_data.username, form_data.password)
-        if not user_login_creds:
-            raise ValidationError(error_msg="Incorrect username or password", status_code=400)
-
         token = set_token(user.username)
+        after_commit(session, lambda: record_write(user.username))
 
-        return {"access_token": token, "token_type": "Bearer"}
+        return TokenResponse(access_token=token, token_type="Bearer")
 
     except ValidationError as ve:
         return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
@@ -78,24 +96,30 @@ async def login_account(form_data: OAuth2PasswordRequestForm = Depends()):
 ###############################################################################
 # Update Account
 ###############################################################################
-@router.put("/api/account/{username}", status_code=200)
-async def update_account_info(payload: BaseUserSchema, current_user: User = Depends(get_current_user)):
+@router.put("/api/account/{username}", status_code=200, response_model=UserResponse)
+async def update_account_info(payload: BaseUserSchema, current_user: User = Depends(get_current_user),
+                              session: AsyncSession = Depends(get_session)):
     try:
-        return await user_service.update_user(username=current_user.username, payload=payload)
+        updated_user = await user_service.update_user(session, username=current_user.username, payload=payload)
+
+        return UserResponse.from_row(updated_user)
 
     except Exception as ex:
         print(f"Server crashed while processing request: {ex}")
         return fastapi.Response(content="Error processing your request.", status_code=500)
 
 
-@router.put("/api/account/{username}/security", status_code=200)
-async def update_account_password(payload: ResetPasswordSchema, current_user: User = Depends(get_current_user)):
+@router.put("/api/account/{username}/security", status_code=200, response_model=UserResponse)
+async def update_account_password(payload: ResetPasswordSchema, current_user: User = Depends(get_current_user),
+                                  session: AsyncSession = Depends(get_session)):
     try:
         if len(payload.new_password) < 10:
             raise ValidationError(error_msg="Password length is less than 10 characters.", status_code=400)
 
-        return await user_service.change_password(username=current_user.username,
-                                                  old_pass=payload.old_password, new_pass=payload.new_password)
+        updated_user = await user_service.change_password(session, username=current_user.username,
+                                                          old_pass=payload.old_password, new_pass=payload.new_password)
+
+        return UserResponse.from_row(updated_user)
 
     except ValidationError as ve:
         return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
@@ -108,13 +132,13 @@ async def update_account_password(payload: ResetPasswordSchema, current_user: Us
 # Delete Account
 ###############################################################################
 @router.delete("/api/account/{username}", status_code=204)
-async def delete_account(current_user: User = Depends(get_current_user)):
+async def delete_account(current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     try:
-        account = await user_service.find_user_by_username(username=current_user.username)
+        account = await user_service.find_user_by_username(session, username=current_user.username)
         if not account:
             return fastapi.Response(content="Account does not exist.", status_code=404)
 
-        await user_service.delete_account(current_user.username)
+        await user_service.delete_account(session, current_user.username)
 
     except Exception as ex:
         print(f"The account could not be found: {ex}")
@@ -1,16 +1,23 @@
 # Imports
 import fastapi
 from fastapi import Depends
-from fastapi_cache.decorator import cache
 from fastapi.security import OAuth2PasswordBearer
+from fastapi_cache import FastAPICache
 from starlette.requests import Request
 # Custom Imports
 from example_com.config import Settings, get_settings
+from example_com.data import db_session
 from example_com.data.account.users import User
-from example_com.infrastructure.jwt_token_auth import get_current_user
+from example_com.infrastructure import principal_cache
+from example_com.infrastructure.cache import cache
+from example_com.infrastructure.cache_tags import user_tag
+from example_com.infrastructure.jwt_token_auth import get_current_user, token_cache_stats
+from example_com.infrastructure.unit_of_work import UnitOfWorkRoute
+from example_com.models.admin_schema import AdminSettingsResponse, CacheStatsResponse, DbPoolStatsResponse, \
+    ResponseCacheStatsResponse
 from example_com.models.validation import ValidationError
 
-router = fastapi.APIRouter()
+router = fastapi.APIRouter(route_class=UnitOfWorkRoute)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
@@ -18,16 +25,88 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 ###############################################################################
 # Admin Settings
 ###############################################################################
-@router.get("/api/admin/settings")
-@cache(expire=7200, namespace="admin-settings")
+@router.get("/api/admin/settings", response_model=AdminSettingsResponse)
+# Tagged with the user, so a change to their account (is_admin included) drops the entry
+@cache(expire=7200, namespace="admin-settings", stale_ttl=300,
+       tags=lambda kwargs: [user_tag(kwargs["current_user"].username)])
 async def account_index(request: Request, settings: Settings = Depends(get_settings), current_user: User = Depends(get_current_user)):
     try:
         if current_user.is_admin:
-            return {
-                "environment": settings.environment,
-                "testing": settings.testing,
-                "database_url": settings.database_url
-            }
+            return AdminSettingsResponse(environment=settings.environment, testing=settings.testing,
+                                         database_url=settings.database_url)
+        else:
+            raise ValidationError("Unauthorized", status_code=401)
+
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
+    except Exception as ex:
+        print(f"Server crashed while processing request: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
+###############################################################################
+# Principal Cache Statistics
+###############################################################################
+@router.get("/api/admin/principal-cache", response_model=CacheStatsResponse)
+async def principal_cache_stats(current_user: User = Depends(get_current_user)):
+    try:
+        if current_user.is_admin:
+            return principal_cache.stats()
+        else:
+            raise ValidationError("Unauthorized", status_code=401)
+
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
+    except Exception as ex:
+        print(f"Server crashed while processing request: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
+###############################################################################
+# Token Cache Statistics
+###############################################################################
+@router.get("/api/admin/token-cache", response_model=CacheStatsResponse)
+async def token_cache_statistics(current_user: User = Depends(get_current_user)):
+    try:
+        if current_user.is_admin:
+            return token_cache_stats()
+        else:
+            raise ValidationError("Unauthorized", status_code=401)
+
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
+    except Exception as ex:
+        print(f"Server crashed while processing request: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
+###############################################################################
+# Database Pool Statistics
+###############################################################################
+@router.get("/api/admin/db-pool", response_model=DbPoolStatsResponse)
+async def db_pool_statistics(current_user: User = Depends(get_current_user)):
+    try:
+        if current_user.is_admin:
+            return db_session.pool_stats()
+        else:
+            raise ValidationError("Unauthorized", status_code=401)
+
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
+    except Exception as ex:
+        print(f"Server crashed while processing request: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
+###############################################################################
+# Response Cache Statistics
+###############################################################################
+@router.get("/api/admin/response-cache", response_model=ResponseCacheStatsResponse)
+async def response_cache_statistics(current_user: User = Depends(get_current_user)):
+    try:
+        if current_user.is_admin:
+            # L1 is this worker's LRU, L2 counts the L1 misses that went to redis
+            return FastAPICache.get_backend().stats()
         else:
             raise ValidationError("Unauthorized", status_code=401)
 
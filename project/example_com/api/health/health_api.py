@@ -0,0 +1,33 @@
+# Imports
+import fastapi
+from fastapi.responses import ORJSONResponse
+# Custom Imports
+from example_com.data import db_session
+from example_com.infrastructure import redis
+from example_com.models.health_schema import LivenessResponse, ReadinessResponse
+
+router = fastapi.APIRouter()
+
+
+###############################################################################
+# Liveness
+###############################################################################
+@router.get("/health/live", response_model=LivenessResponse)
+async def liveness():
+    return {"status": "ok"}
+
+
+###############################################################################
+# Readiness
+###############################################################################
+@router.get("/health/ready", response_model=ReadinessResponse)
+async def readiness():
+    checks = {
+        "database": await db_session.ping(),
+        "schema": await db_session.check_schema_version(),
+        "redis": await redis.ping()
+    }
+    if not all(checks.values()):
+        return ORJSONResponse(content={"status": "unavailable", **checks}, status_code=503)
+
+    return {"status": "ok", **checks}
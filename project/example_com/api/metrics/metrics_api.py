@@ -0,0 +1,16 @@
+# Imports
+import fastapi
+# Custom Imports
+from example_com.infrastructure import metrics
+
+router = fastapi.APIRouter()
+
+
+###############################################################################
+# Prometheus Metrics
+###############################################################################
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    content, media_type = metrics.render()
+
+    return fastapi.Response(content=content, media_type=media_type)
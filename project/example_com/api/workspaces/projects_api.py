@@ -1,18 +1,30 @@
 # Imports
 import fastapi
-from fastapi import Depends, Path
-from fastapi_cache import JsonCoder
-from fastapi_cache.decorator import cache
+import orjson
+from fastapi import Depends, Header, Path, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
+from typing import AsyncIterator, Optional
 # Custom Imports
 from example_com.data.account.users import User
+from example_com.infrastructure import read_your_writes
+from example_com.infrastructure.cache import cache
+from example_com.infrastructure.cache_tags import project_tag, user_projects_tag
+from example_com.infrastructure.conditional import is_conditional, is_not_modified, not_modified, page_etag, \
+    parse_if_match, set_validators, version_etag
 from example_com.infrastructure.jwt_token_auth import get_current_user
-from example_com.models.project_schema import ProjectModel
+from example_com.infrastructure.serialization import ModelResponse
+from example_com.infrastructure.unit_of_work import UnitOfWorkRoute, get_session
+from example_com.models.pagination import decode_cursor, encode_cursor
+from example_com.models.project_schema import ProjectBatch, ProjectBatchResponse, ProjectMemberModel, \
+    ProjectMemberResponse, ProjectModel, ProjectPage, ProjectResponse, ProjectSearchPage, ProjectSearchResult, \
+    ProjectUpsertModel
 from example_com.models.validation import ValidationError
 from example_com.services import project_service
 
-router = fastapi.APIRouter()
+router = fastapi.APIRouter(route_class=UnitOfWorkRoute)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
@@ -20,30 +32,117 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 ###############################################################################
 # Projects
 ###############################################################################
-@router.get("/api/workspaces/projects")
-#@cache(expire=7200, coder=JsonCoder, namespace="get-projects")
-async def get_projects(request: Request, current_user: User = Depends(get_current_user)):
+@router.get("/api/workspaces/projects", response_model=ProjectPage)
+@cache(expire=7200, namespace="get-projects",
+       tags=lambda kwargs: [user_projects_tag(kwargs["current_user"].username)])
+async def get_projects(request: Request, response: fastapi.Response, limit: int = Query(50, ge=1, le=200),
+                       cursor: Optional[str] = None, member: Optional[str] = Query(None, regex="^me$"),
+                       current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     try:
-        project = await project_service.get_projects(owner=current_user.username)
-        if not project:
+        before_id = decode_cursor(cursor) if cursor else None
+        # member=me adds the projects the caller belongs to
+        include_member = member is not None
+
+        # Ids and versions of the page are enough to answer a revalidation without loading the projects
+        if is_conditional(request):
+            versions = await project_service.get_projects_versions(session, owner=current_user.username,
+                                                                   limit=limit + 1, before_id=before_id,
+                                                                   member=include_member)
+            etag = page_etag(versions, limit, cursor, member)
+            if versions and is_not_modified(request, etag):
+                return not_modified(etag)
+
+        # Fetch one extra row to learn whether another page follows
+        projects = await project_service.get_projects(session, owner=current_user.username, limit=limit + 1,
+                                                      before_id=before_id, member=include_member)
+        if not projects and not cursor:
             return fastapi.Response(content="Project does not exist.", status_code=404)
 
-        return project
+        next_cursor = encode_cursor(projects[limit - 1].id) if len(projects) > limit else None
+
+        # Deletes do not show in any updated_at, so the list only gets an ETag and no Last-Modified
+        set_validators(response, page_etag([(p.id, p.version) for p in projects], limit, cursor, member))
 
+        return ProjectPage(projects=[ProjectResponse.from_row(project) for project in projects[:limit]],
+                           next_cursor=next_cursor)
+
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
     except Exception as ex:
         print(f"Server crashed while processing request: {ex}")
         return fastapi.Response(content="Error processing your request.", status_code=500)
 
 
-@router.get("/api/workspaces/projects/{id}")
-#@cache(expire=7200, coder=JsonCoder, namespace="get-project-by-id")
-async def get_project(id: int = Path(..., gt=0), current_user: User = Depends(get_current_user)):
+# Declared before /{id} so "search" is not parsed as a project id
+@router.get("/api/workspaces/projects/search", response_model=ProjectSearchPage)
+async def search_projects(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100),
+                          offset: int = Query(0, ge=0, le=10_000), current_user: User = Depends(get_current_user),
+                          session: AsyncSession = Depends(get_session)):
     try:
-        project = await project_service.get_project_by_id(id=id, owner=current_user.username)
+        # Fetch one extra row to learn whether another page follows
+        projects = await project_service.search_projects(session, owner=current_user.username, terms=q,
+                                                         limit=limit + 1, offset=offset)
+        next_offset = offset + limit if len(projects) > limit else None
+
+        return ModelResponse(ProjectSearchPage(
+            projects=[ProjectSearchResult.from_row(project) for project in projects[:limit]],
+            next_offset=next_offset
+        ))
+
+    except Exception as ex:
+        print(f"Server crashed while processing request: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
+# Declared before /{id} so "export" is not parsed as a project id
+@router.get("/api/workspaces/projects/export")
+async def export_projects(request: Request, current_user: User = Depends(get_current_user)):
+    try:
+        # get_current_user hands back its 401 response for an invalid token
+        if isinstance(current_user, fastapi.Response):
+            return current_user
+
+        replica = not read_your_writes.reads_primary(current_user.username)
+
+        return StreamingResponse(ndjson_projects(request, current_user.username, replica),
+                                 media_type="application/x-ndjson")
+
+    except Exception as ex:
+        print(f"Server crashed while processing request: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
+async def ndjson_projects(request: Request, owner: str, replica: bool) -> AsyncIterator[bytes]:
+    """ One JSON document per line, written a batch at a time as rows arrive from the database """
+    async for batch in project_service.stream_projects(owner=owner, replica=replica):
+        # Starlette also cancels the stream on disconnect, this stops before reading the next batch
+        if await request.is_disconnected():
+            break
+
+        # orjson writes datetimes itself, no jsonable_encoder pass over every row
+        yield b"".join(orjson.dumps(project) + b"\n" for project in batch)
+
+
+@router.get("/api/workspaces/projects/{id}", response_model=ProjectResponse)
+@cache(expire=7200, namespace="get-project-by-id",
+       tags=lambda kwargs: [project_tag(kwargs["id"])])
+async def get_project(request: Request, response: fastapi.Response, id: int = Path(..., gt=0),
+                      current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+    try:
+        if is_conditional(request):
+            validators = await project_service.get_project_validators(session, id=id, owner=current_user.username)
+            if not validators:
+                return fastapi.Response(content="Project does not exist.", status_code=404)
+            if is_not_modified(request, version_etag(validators.version), validators.updated_at):
+                return not_modified(version_etag(validators.version), validators.updated_at)
+
+        project = await project_service.get_project_by_id(session, id=id, owner=current_user.username)
         if not project:
             return fastapi.Response(content="Project does not exist.", status_code=404)
 
-        return project
+        set_validators(response, version_etag(project.version), project.updated_at)
+
+        return ProjectResponse.from_row(project)
 
     except Exception as ex:
         print(f"Server crashed while processing request: {ex}")
@@ -53,11 +152,13 @@ async def get_project(id: int = Path(..., gt=0), current_user: User = Depends(ge
 ###############################################################################
 # New Projects
 ###############################################################################
-@router.post("/api/workspaces/projects/new", status_code=201)
+@router.post("/api/workspaces/projects/new", status_code=201, response_model=ProjectResponse)
 async def post_new_project(new_project: ProjectModel,
-                            current_user: User = Depends(get_current_user)):
+                            current_user: User = Depends(get_current_user),
+                            session: AsyncSession = Depends(get_session)):
     try:
-        return await project_service.create_project(new_project.project_name,
+        return await project_service.create_project(session,
+                                                     new_project.project_name,
                                                      new_project.project_summary,
                                                      current_user.username,
                                                      new_project.members
@@ -70,38 +171,120 @@ async def post_new_project(new_project: ProjectModel,
         return fastapi.Response(content="Error processing your request.", status_code=500)
 
 
+@router.post("/api/workspaces/projects/bulk", status_code=200, response_model=ProjectBatchResponse)
+async def post_new_projects(new_projects: ProjectBatch, current_user: User = Depends(get_current_user),
+                            session: AsyncSession = Depends(get_session)):
+    try:
+        results = await project_service.create_projects(session, new_projects, current_user.username)
+
+        return {
+            "created": sum(1 for result in results if result["status_code"] == 201),
+            "results": results
+        }
+
+    except Exception as ex:
+        print(f"The projects could not be created: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
 ###############################################################################
 # Update Project
 ###############################################################################
-@router.put("/api/workspaces/projects/{id}", status_code=200)
-async def update_project(payload: ProjectModel, id: int = Path(..., gt=0),
-                          current_user: User = Depends(get_current_user)):
+@router.put("/api/workspaces/projects/{id}", status_code=200, response_model=ProjectResponse)
+async def update_project(payload: ProjectModel, response: fastapi.Response, id: int = Path(..., gt=0),
+                          if_match: Optional[str] = Header(None), current_user: User = Depends(get_current_user),
+                          session: AsyncSession = Depends(get_session)):
     try:
-        project = await project_service.get_project_by_id(id=id, owner=current_user.username)
-        if not project:
+        updated_project = await project_service.update_project(session, id=id, owner=current_user.username,
+                                                               payload=payload,
+                                                               expected_version=parse_if_match(if_match))
+        if not updated_project:
             return fastapi.Response(content="Project does not exist.", status_code=404)
 
-        updated_project = await project_service.update_project(id=id, owner=current_user.username, payload=payload)
+        set_validators(response, version_etag(updated_project["version"]), updated_project["updated_at"])
 
         return updated_project
 
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
     except Exception as ex:
         print(f"The project could not be found: {ex}")
         return fastapi.Response(content="Error processing your request.", status_code=500)
 
 
+@router.put("/api/workspaces/projects/by-name/{project_name}", status_code=200, response_model=ProjectResponse)
+async def upsert_project(payload: ProjectUpsertModel, response: fastapi.Response,
+                         project_name: str = Path(..., regex=r"^\S(.*\S)?$"),
+                         current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+    try:
+        project, created = await project_service.upsert_project(session, project_name=project_name,
+                                                                owner=current_user.username, payload=payload)
+        if created:
+            response.status_code = 201
+        set_validators(response, version_etag(project["version"]), project["updated_at"])
+
+        return project
+
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
+    except Exception as ex:
+        print(f"The project could not be saved: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
+###############################################################################
+# Project Members
+###############################################################################
+@router.post("/api/workspaces/projects/{id}/members", status_code=201, response_model=ProjectMemberResponse)
+async def add_project_member(payload: ProjectMemberModel, response: fastapi.Response, id: int = Path(..., gt=0),
+                             current_user: User = Depends(get_current_user),
+                             session: AsyncSession = Depends(get_session)):
+    try:
+        added = await project_service.add_member(session, id=id, owner=current_user.username, username=payload.username)
+        if added is None:
+            return fastapi.Response(content="Project does not exist.", status_code=404)
+        if not added:
+            response.status_code = 200
+
+        return {"project_id": id, "username": payload.username}
+
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
+    except Exception as ex:
+        print(f"The member could not be added: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
+@router.delete("/api/workspaces/projects/{id}/members/{username}", status_code=204)
+async def remove_project_member(id: int = Path(..., gt=0), username: str = Path(...),
+                                current_user: User = Depends(get_current_user),
+                                session: AsyncSession = Depends(get_session)):
+    try:
+        removed = await project_service.remove_member(session, id=id, owner=current_user.username, username=username)
+        if removed is None:
+            return fastapi.Response(content="Project does not exist.", status_code=404)
+        if not removed:
+            return fastapi.Response(content="Member does not exist.", status_code=404)
+
+    except Exception as ex:
+        print(f"The member could not be removed: {ex}")
+        return fastapi.Response(content="Error processing your request.", status_code=500)
+
+
 ###############################################################################
 # Delete Project
 ###############################################################################
 @router.delete("/api/workspaces/projects/{id}", status_code=204)
-async def delete_project(id: int = Path(..., gt=0), current_user: User = Depends(get_current_user)):
+async def delete_project(id: int = Path(..., gt=0), if_match: Optional[str] = Header(None),
+                         current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     try:
-        project = await project_service.get_project_by_id(id=id, owner=current_user.username)
-        if not project:
+        deleted = await project_service.delete_project(session, id=id, owner=current_user.username,
+                                                       expected_version=parse_if_match(if_match))
+        if not deleted:
             return fastapi.Response(content="Project does not exist.", status_code=404)
 
-        await project_service.delete_project(id=id, owner=current_user.username)
-
+    except ValidationError as ve:
+        return fastapi.Response(content=ve.error_msg, status_code=ve.status_code)
     except Exception as ex:
         print(f"The project could not be found: {ex}")
         return fastapi.Response(content="Error processing your request.", status_code=500)
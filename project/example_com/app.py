@@ -7,28 +7,38 @@
 ###############################################################################
 
 # Imports
-import aioredis
 import json
 import logging
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from pathlib import Path
 # Custom Imports
-from example_com.config import tome_key_builder
+from example_com.config import get_settings
 from example_com.data import db_session
 from example_com.api.admin import admin_api
 from example_com.api.account import accounts_api
 from example_com.api.workspaces import projects_api
+from example_com.api.health import health_api
+from example_com.api.metrics import metrics_api
+from example_com.infrastructure import hashing
 from example_com.infrastructure import jwt_token_auth
+from example_com.infrastructure import metrics
+from example_com.infrastructure import principal_cache
+from example_com.infrastructure import read_your_writes
+from example_com.infrastructure import redis
+from example_com.infrastructure import two_tier_cache
+from example_com.infrastructure.cache import tome_key_builder
 
 log = logging.getLogger("uvicorn")
 
 
 def create_app() -> FastAPI:
-    api = FastAPI()
+    api = FastAPI(default_response_class=ORJSONResponse)
     configure_settings()
     configure_routers(api)
+    configure_middleware(api)
+    configure_events(api)
 
     return api
 
@@ -46,20 +56,61 @@ def configure_settings():
 
 
 def configure_routers(api):
+    api.include_router(health_api.router, tags=["health"])
+    api.include_router(metrics_api.router, tags=["metrics"])
     api.include_router(admin_api.router, tags=["admin"])
     api.include_router(accounts_api.router, tags=["accounts"])
     api.include_router(projects_api.router, tags=["projects"])
 
 
-app = create_app()
+def configure_middleware(api):
+    api.add_middleware(metrics.MetricsMiddleware)
+
+
+def configure_events(api):
+    api.add_event_handler("startup", startup)
+    api.add_event_handler("shutdown", shutdown)
 
 
 async def setup_db():
     await db_session.global_init()
 
 
-@app.on_event("startup")
+async def setup_redis():
+    settings = get_settings()
+    await redis.global_init(settings.redis_url, settings.redis_max_connections)
+    backend = two_tier_cache.TwoTierBackend(two_tier_cache.CurrentRedisBackend(), settings.response_cache_size,
+                                            settings.response_cache_ttl)
+    FastAPICache.init(backend, key_builder=tome_key_builder, prefix="example")
+    # init() keeps the first backend of the process, that is the one to invalidate
+    redis.subscribe(two_tier_cache.INVALIDATION_CHANNEL, FastAPICache.get_backend().on_invalidation)
+
+
+def setup_caches():
+    settings = get_settings()
+    principal_cache.global_init(settings.principal_cache_size, settings.principal_cache_ttl)
+    jwt_token_auth.configure_token_cache(settings.token_cache_size, settings.token_cache_ttl)
+    read_your_writes.global_init(settings.read_your_writes_window)
+
+
+def setup_hashing():
+    settings = get_settings()
+    hashing.global_init(settings.hash_pool_workers, settings.hash_pool_queue_size,
+                        schemes=[scheme.strip() for scheme in settings.password_schemes.split(",")],
+                        rounds=settings.password_rounds)
+
+
 async def startup():
-    redis = aioredis.from_url(url="redis://localhost", encoding="utf-8", decode_responses=True)
-    FastAPICache.init(RedisBackend(redis), key_builder=tome_key_builder, prefix="example")
+    setup_caches()
+    setup_hashing()
+    await setup_redis()
     await setup_db()
+    await redis.start_listener()
+
+
+async def shutdown():
+    await redis.global_close()
+    hashing.global_close()
+
+
+app = create_app()
@@ -1,18 +1,8 @@
 # Imports
-import asyncio
-import hashlib
 import logging
-import nest_asyncio
 import os
 from functools import lru_cache
-from fastapi_cache import FastAPICache
 from pydantic import BaseSettings, AnyUrl
-from starlette.requests import Request
-from starlette.responses import Response
-from typing import Optional
-# Custom Imports
-from example_com.infrastructure.jwt_token_auth import decode_auth_value
-from example_com.infrastructure.redis import check_master_hash
 
 log = logging.getLogger("uvicorn")
 
@@ -25,11 +15,51 @@ class Settings(BaseSettings):
         environment (str): Defines the environment (i.e. dev, test, prod)
         testing (bool): Defines whether or not we're in test mode
         database_url (AnyUrl): Defines the database URI path
+        database_replica_urls (str): Comma separated URIs of read replicas of the database, empty reads the primary
+        read_your_writes_window (float): Seconds a user's reads stay on the primary after they wrote
+        db_pool_size (int): Connections each worker keeps open to the database
+        db_max_overflow (int): Extra connections a worker may open when the pool is exhausted
+        db_pool_timeout (float): Seconds to wait for a free connection before failing
+        db_pool_recycle (int): Seconds after which a connection is replaced, -1 never recycles
+        db_pool_pre_ping (bool): Test connections for liveness on checkout
+        db_statement_cache_size (int): Prepared statements cached per asyncpg connection
+        redis_url (str): Defines the redis URI path
+        redis_max_connections (int): Maximum connections held by the shared redis pool
+        principal_cache_size (int): Maximum authenticated users cached per worker
+        principal_cache_ttl (float): Seconds a cached authenticated user is trusted
+        token_cache_size (int): Maximum validated JWT payloads cached per worker
+        token_cache_ttl (float): Upper bound in seconds on how long a validated payload is reused
+        response_cache_size (int): Maximum cached responses each worker keeps in front of redis
+        response_cache_ttl (float): Seconds a worker reuses a cached response before asking redis again
+        hash_pool_workers (int): Processes hashing passwords off the event loop, 0 hashes inline
+        hash_pool_queue_size (int): Hashing calls allowed to wait before requests get a 503
+        password_schemes (str): Comma separated password hashers, the first hashes new passwords
+        password_rounds (int): Cost of the default password hasher, lower it for fast tests
     """
 
     environment: str = os.getenv("ENVIRONMENT", "dev")
     testing: bool = os.getenv("TESTING", 0)
     database_url: AnyUrl = os.environ.get("DATABASE_URL")
+    database_replica_urls: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    read_your_writes_window: float = os.getenv("READ_YOUR_WRITES_WINDOW", 5)
+    db_pool_size: int = os.getenv("DB_POOL_SIZE", 5)
+    db_max_overflow: int = os.getenv("DB_MAX_OVERFLOW", 10)
+    db_pool_timeout: float = os.getenv("DB_POOL_TIMEOUT", 30)
+    db_pool_recycle: int = os.getenv("DB_POOL_RECYCLE", 1800)
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", 0)
+    db_statement_cache_size: int = os.getenv("DB_STATEMENT_CACHE_SIZE", 100)
+    redis_url: str = os.getenv("REDIS_URL", "redis://localhost")
+    redis_max_connections: int = os.getenv("REDIS_MAX_CONNECTIONS", 50)
+    principal_cache_size: int = os.getenv("PRINCIPAL_CACHE_SIZE", 10_000)
+    principal_cache_ttl: float = os.getenv("PRINCIPAL_CACHE_TTL", 60)
+    token_cache_size: int = os.getenv("TOKEN_CACHE_SIZE", 10_000)
+    token_cache_ttl: float = os.getenv("TOKEN_CACHE_TTL", 300)
+    response_cache_size: int = os.getenv("RESPONSE_CACHE_SIZE", 5_000)
+    response_cache_ttl: float = os.getenv("RESPONSE_CACHE_TTL", 30)
+    hash_pool_workers: int = os.getenv("HASH_POOL_WORKERS", 2)
+    hash_pool_queue_size: int = os.getenv("HASH_POOL_QUEUE_SIZE", 32)
+    password_schemes: str = os.getenv("PASSWORD_SCHEMES", "sha512_crypt")
+    password_rounds: int = os.getenv("PASSWORD_ROUNDS", 184_597)
 
 
 @lru_cache()
@@ -42,34 +72,3 @@ def get_settings() -> BaseSettings:
     log.info("Loading config settings from the environment...")
     return Settings()
 
-
-def tome_key_builder(
-        func,
-        namespace: Optional[str] = "",
-        request: Optional[Request] = None,
-        response: Optional[Response] = None,
-        args: Optional[tuple] = None,
-        kwargs: Optional[dict] = None,
-):
-
-    prefix = f"{FastAPICache.get_prefix()}:{namespace}:"
-    cache_key = (
-            prefix
-            + hashlib.md5(f"{func.__module__}:{func.__name__}:{args}:{kwargs}".encode('utf-8'))
-            .hexdigest()
-    )
-
-    if not request.headers.get("authorization"):
-        print("Authoriation:", request.headers.get("authorization"))
-        return cache_key
-
-    nest_asyncio.apply()
-    loop = asyncio.get_event_loop()
-
-    auth_token = request.headers.get("authorization").split()[-1]
-    payload = loop.run_until_complete(decode_auth_value(auth_token))
-    username = payload.get('username')
-
-    loop.run_until_complete(check_master_hash(username, namespace, auth_token, cache_key))
-
-    return cache_key
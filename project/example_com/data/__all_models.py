@@ -2,3 +2,5 @@
 from example_com.data.account.users import User
 # noinspection PyUnresolvedReferences
 from example_com.data.workspaces.projects import Project
+# noinspection PyUnresolvedReferences
+from example_com.data.workspaces.project_members import ProjectMember
@@ -20,7 +20,7 @@ class User(SqlAlchemyBase):
     confirmed: bool = sa.Column(sa.Boolean, nullable=False, default=False)
     confirmed_on = sa.Column(sa.DateTime, nullable=True)
     created_at = sa.Column(sa.DateTime, default=datetime.datetime.now)
-    updated_at = sa.Column(sa.DateTime, default=datetime.datetime.now)
+    updated_at = sa.Column(sa.DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
     last_login = sa.Column(sa.DateTime, default=datetime.datetime.now)
     is_admin = sa.Column(sa.Boolean, default=False)
 
@@ -1,26 +1,240 @@
 # Imports
+import itertools
+import logging
 import os
-from typing import Optional
+import time
+from typing import Callable, List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 # Custom Imports
-from example_com.data.modelbase import SqlAlchemyBase
+from example_com.config import get_settings
+from example_com.data.migrations import SCHEMA_VERSION
+from example_com.infrastructure import metrics
+
+log = logging.getLogger("uvicorn")
 
 __async_engine: Optional[AsyncEngine] = None
+__replica_engines: List[AsyncEngine] = []
+__replica_cycle = itertools.cycle([])
+__schema_ready: bool = False
 DATABASE_URL: Optional[str] = None
 
+# Kept in the info of a routed session, whether it should read from a replica and the engine it settled on
+USE_REPLICA = "use_replica"
+ROUTED_ENGINE = "routed_engine"
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """ Connection pool that records how long callers wait to check out a connection and how many are in use """
+
+    # The engine the pool belongs to in metrics and pool stats, set by create_engine()
+    engine_name = "primary"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            metrics.DB_POOL_CHECKOUT_WAIT.labels(self.engine_name).observe(wait)
+            metrics.DB_POOL_CHECKED_OUT.labels(self.engine_name).set(self.checkedout())
+
+    def _do_return_conn(self, conn):
+        super()._do_return_conn(conn)
+        metrics.DB_POOL_CHECKED_OUT.labels(self.engine_name).set(self.checkedout())
+
+    def recreate(self) -> "TimedQueuePool":
+        # Disposing the engine swaps in a new pool, it keeps the name
+        pool = super().recreate()
+        pool.engine_name = self.engine_name
+
+        return pool
+
+
+class RoutingSession(Session):
+    """
+    Session that picks its engine at its first statement, one of the replicas when the USE_REPLICA
+    callable in its info says so and the primary otherwise. It keeps that engine until it is closed.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        engine = self.info.get(ROUTED_ENGINE)
+        if engine is None:
+            use_replica = self.info.get(USE_REPLICA)
+            engine = replica_engine() if use_replica and use_replica() else get_engine()
+            self.info[ROUTED_ENGINE] = engine
+
+        return engine.sync_engine
+
 
 async def global_init():
-    global __async_engine
+    global __async_engine, __replica_engines, __replica_cycle
 
+    settings = get_settings()
     async_conn_str = os.environ.get("DATABASE_URL")
-    __async_engine = create_async_engine(async_conn_str, echo=False)
+
+    __async_engine = create_engine(async_conn_str, "primary")
+    # Each replica gets a pool of the primary's size, in every worker
+    replica_urls = [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+    __replica_engines = [create_engine(url, replica_name(url)) for url in replica_urls]
+    __replica_cycle = itertools.cycle(__replica_engines)
 
     # noinspection PyUnresolvedReferences
     import example_com.data.__all_models
 
-    # Create Tables from the Models
-    async with __async_engine.begin() as conn:
-        await conn.run_sync(SqlAlchemyBase.metadata.create_all)
+    # Tables are created by the migration step (python -m example_com.data.migrate), not at startup
+    await check_schema_version()
+
+
+def replica_name(async_conn_str: str) -> str:
+    """ Host and database of a replica, without its credentials """
+    url = make_url(async_conn_str)
+
+    return f"{url.host}/{url.database}"
+
+
+def create_engine(async_conn_str: str, name: str) -> AsyncEngine:
+    settings = get_settings()
+
+    connect_args = {}
+    if async_conn_str.startswith("postgresql+asyncpg"):
+        connect_args["prepared_statement_cache_size"] = settings.db_statement_cache_size
+
+    engine = create_async_engine(async_conn_str,
+                                 echo=False,
+                                 poolclass=TimedQueuePool,
+                                 pool_size=settings.db_pool_size,
+                                 max_overflow=settings.db_max_overflow,
+                                 pool_timeout=settings.db_pool_timeout,
+                                 pool_recycle=settings.db_pool_recycle,
+                                 pool_pre_ping=settings.db_pool_pre_ping,
+                                 connect_args=connect_args)
+    engine.pool.engine_name = name
+    instrument(engine)
+
+    return engine
+
+
+def instrument(engine: AsyncEngine):
+    """ Time every statement the engine executes, failed ones included """
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", start_statement)
+    event.listen(sync_engine, "after_cursor_execute", finish_statement)
+    event.listen(sync_engine, "handle_error", fail_statement)
+
+
+def start_statement(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_start = time.perf_counter()
+
+
+def finish_statement(conn, cursor, statement, parameters, context, executemany):
+    observe_statement(statement, context)
+
+
+def fail_statement(exception_context):
+    if exception_context.execution_context is not None:
+        observe_statement(exception_context.statement or "", exception_context.execution_context)
+
+
+def observe_statement(statement: str, context):
+    start = getattr(context, "metrics_start", None)
+    if start is None:
+        return
+
+    context.metrics_start = None
+    metrics.DB_STATEMENT_DURATION.labels(metrics.statement_operation(statement)).observe(time.perf_counter() - start)
+
+
+async def check_schema_version() -> bool:
+    """ Whether the database has every migration this build expects, remembered once it does """
+    global __schema_ready
+
+    if __schema_ready:
+        return True
+
+    try:
+        async with get_engine().connect() as conn:
+            result = await conn.execute(text("SELECT coalesce(max(version), 0) FROM schema_version"))
+            version = result.scalar_one()
+    except Exception as ex:
+        log.warning(f"Could not read the schema version: {ex}")
+        return False
+
+    __schema_ready = version >= SCHEMA_VERSION
+    if not __schema_ready:
+        log.warning(f"Database schema is at version {version}, this build needs {SCHEMA_VERSION}")
+
+    return __schema_ready
+
+
+async def ping() -> bool:
+    """ Whether the primary and every replica answer """
+    for engine in [get_engine(), *__replica_engines]:
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        except Exception as ex:
+            log.warning(f"Database {engine.url.host} is not reachable: {ex}")
+            return False
+
+    return True
+
+
+def get_engine() -> AsyncEngine:
+    global __async_engine
+
+    if not __async_engine:
+        raise Exception("You must call global_init() before using this method")
+
+    return __async_engine
+
+
+def has_replicas() -> bool:
+    return bool(__replica_engines)
+
+
+def replica_engine() -> AsyncEngine:
+    """ The next replica in turn, the primary when there are none """
+    if not __replica_engines:
+        return get_engine()
+
+    return next(__replica_cycle)
+
+
+def pool_stats() -> dict:
+    """ Usage of the primary's pool, with the replicas' pools by name """
+    stats = engine_pool_stats(get_engine())
+    stats["replicas"] = {engine.pool.engine_name: engine_pool_stats(engine) for engine in __replica_engines}
+
+    return stats
+
+
+def engine_pool_stats(engine: AsyncEngine) -> dict:
+    pool: TimedQueuePool = engine.pool
+
+    return {
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool counts overflow from -pool_size, only connections beyond the pool are overflow
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": pool.checkouts,
+        "wait_seconds_total": pool.wait_seconds_total,
+        "wait_seconds_max": pool.wait_seconds_max,
+        "wait_seconds_avg": pool.wait_seconds_total / pool.checkouts if pool.checkouts else 0.0
+    }
 
 
 def create_session() -> AsyncSession:
@@ -34,3 +248,14 @@ def create_session() -> AsyncSession:
 
     return session
 
+
+def create_routed_session(use_replica: Callable[[], bool]) -> AsyncSession:
+    """ Session for read-only work, on a replica unless use_replica() says otherwise at its first statement """
+    if not __async_engine:
+        raise Exception("You must call global_init() before using this method")
+
+    session: AsyncSession = AsyncSession(sync_session_class=RoutingSession)
+    session.sync_session.expire_on_commit = False
+    session.info[USE_REPLICA] = use_replica
+
+    return session
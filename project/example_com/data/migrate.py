@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+###############################################################################
+# Script      : migrate.py
+# Description : Applies pending schema migrations, run once per deploy before the app starts
+###############################################################################
+"""
+    python -m example_com.data.migrate
+
+Migrations live in example_com/data/migrations and are applied in order, each in its own
+transaction. An advisory lock makes concurrent runs wait for each other instead of racing on DDL.
+"""
+
+# Imports
+import asyncio
+import logging
+import os
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+# Custom Imports
+from example_com.data.migrations import MIGRATIONS
+
+log = logging.getLogger("uvicorn")
+
+# Arbitrary key shared by every migration run
+MIGRATION_LOCK_KEY = 716_204_551
+
+CREATE_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER NOT NULL,
+        description VARCHAR NOT NULL,
+        applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+        PRIMARY KEY (version)
+    )
+"""
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    result = await conn.execute(text("SELECT coalesce(max(version), 0) FROM schema_version"))
+
+    return result.scalar_one()
+
+
+async def run_migrations(database_url: str) -> int:
+    engine = create_async_engine(database_url, echo=False)
+    try:
+        for migration in MIGRATIONS:
+            async with engine.begin() as conn:
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                await conn.execute(text(CREATE_VERSION_TABLE))
+                if await current_version(conn) >= migration.VERSION:
+                    continue
+
+                log.info(f"Applying migration {migration.VERSION}: {migration.DESCRIPTION}")
+                for statement in migration.STATEMENTS:
+                    await conn.execute(text(statement))
+                await conn.execute(text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+                                   {"version": migration.VERSION, "description": migration.DESCRIPTION})
+
+        async with engine.connect() as conn:
+            return await current_version(conn)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    version = asyncio.run(run_migrations(os.environ.get("DATABASE_URL")))
+    log.info(f"Database schema is at version {version}")
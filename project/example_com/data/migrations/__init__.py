@@ -0,0 +1,19 @@
+# Custom Imports
+from example_com.data.migrations import m0001_initial_schema
+from example_com.data.migrations import m0002_projects_owner_id_index
+from example_com.data.migrations import m0003_projects_owner_name_unique
+from example_com.data.migrations import m0004_projects_version
+from example_com.data.migrations import m0005_project_members
+from example_com.data.migrations import m0006_projects_search
+
+# Applied in order by example_com.data.migrate, append new migrations at the end
+MIGRATIONS = [
+    m0001_initial_schema,
+    m0002_projects_owner_id_index,
+    m0003_projects_owner_name_unique,
+    m0004_projects_version,
+    m0005_project_members,
+    m0006_projects_search,
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].VERSION
@@ -0,0 +1,41 @@
+# Schema previously created by metadata.create_all at startup, IF NOT EXISTS adopts existing databases
+VERSION = 1
+DESCRIPTION = "Initial users and projects schema"
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL NOT NULL,
+        first_name VARCHAR NOT NULL,
+        last_name VARCHAR NOT NULL,
+        username VARCHAR NOT NULL,
+        email VARCHAR NOT NULL,
+        hashed_password VARCHAR NOT NULL,
+        profile_image_url VARCHAR,
+        confirmed BOOLEAN NOT NULL,
+        confirmed_on TIMESTAMP WITHOUT TIME ZONE,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        updated_at TIMESTAMP WITHOUT TIME ZONE,
+        last_login TIMESTAMP WITHOUT TIME ZONE,
+        is_admin BOOLEAN,
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_username ON users (username)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    "CREATE INDEX IF NOT EXISTS ix_users_hashed_password ON users (hashed_password)",
+    """
+    CREATE TABLE IF NOT EXISTS projects (
+        id SERIAL NOT NULL,
+        project_name VARCHAR NOT NULL,
+        project_summary VARCHAR,
+        owner VARCHAR,
+        members VARCHAR[],
+        project_profile_img VARCHAR,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        updated_at TIMESTAMP WITHOUT TIME ZONE,
+        PRIMARY KEY (id),
+        FOREIGN KEY(owner) REFERENCES users (username)
+    )
+    """,
+]
@@ -0,0 +1,7 @@
+# Keyset pagination of an owner's projects by id DESC
+VERSION = 2
+DESCRIPTION = "Index projects by (owner, id)"
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_projects_owner_id ON projects (owner, id)",
+]
@@ -0,0 +1,36 @@
+# Project names are unique per owner, enforced by the database instead of a SELECT before each insert
+VERSION = 3
+DESCRIPTION = "Unique project names per owner"
+
+STATEMENTS = [
+    # Names that slipped past the old check-then-insert race keep their oldest project, later ones get their id,
+    # and a counter after it while that name is taken as well
+    """
+    DO $$
+    DECLARE
+        duplicate RECORD;
+        candidate TEXT;
+        attempt INTEGER;
+    BEGIN
+        FOR duplicate IN
+            SELECT p.id, p.owner, p.project_name FROM projects AS p
+            WHERE EXISTS (
+                SELECT 1 FROM projects AS q
+                WHERE q.owner = p.owner AND q.project_name = p.project_name AND q.id < p.id
+            )
+            ORDER BY p.id
+        LOOP
+            candidate := duplicate.project_name || ' (' || duplicate.id || ')';
+            attempt := 1;
+            WHILE EXISTS (SELECT 1 FROM projects WHERE owner = duplicate.owner AND project_name = candidate) LOOP
+                attempt := attempt + 1;
+                candidate := duplicate.project_name || ' (' || duplicate.id || '-' || attempt || ')';
+            END LOOP;
+
+            UPDATE projects SET project_name = candidate WHERE id = duplicate.id;
+        END LOOP;
+    END
+    $$
+    """,
+    "ALTER TABLE projects ADD CONSTRAINT uq_projects_owner_project_name UNIQUE (owner, project_name)",
+]
@@ -0,0 +1,7 @@
+# Row version for optimistic concurrency, bumped by every write and exposed as the ETag
+VERSION = 4
+DESCRIPTION = "Version projects for If-Match"
+
+STATEMENTS = [
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+]
@@ -0,0 +1,27 @@
+# Membership moves from the unindexed projects.members array to an association table
+VERSION = 5
+DESCRIPTION = "Move project members to project_members"
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS project_members (
+        project_id INTEGER NOT NULL,
+        username VARCHAR NOT NULL,
+        added_at TIMESTAMP WITHOUT TIME ZONE,
+        PRIMARY KEY (project_id, username),
+        FOREIGN KEY(project_id) REFERENCES projects (id) ON DELETE CASCADE,
+        FOREIGN KEY(username) REFERENCES users (username) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_project_members_username_project_id ON project_members (username, project_id)",
+    # Only names that belong to an account can be members, anything else in the arrays is dropped
+    """
+    INSERT INTO project_members (project_id, username, added_at)
+    SELECT DISTINCT p.id, m.username, now()
+    FROM projects AS p
+    CROSS JOIN LATERAL unnest(p.members) AS m(username)
+    JOIN users AS u ON u.username = m.username
+    ON CONFLICT DO NOTHING
+    """,
+    "ALTER TABLE projects DROP COLUMN IF EXISTS members",
+]
@@ -0,0 +1,13 @@
+# Full-text search over project names and summaries, names weigh more than summaries
+VERSION = 6
+DESCRIPTION = "Search projects by name and summary"
+
+STATEMENTS = [
+    """
+    ALTER TABLE projects ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(project_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(project_summary, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_projects_search_vector ON projects USING GIN (search_vector)",
+]
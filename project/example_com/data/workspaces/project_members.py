@@ -0,0 +1,17 @@
+# Imports
+import datetime
+import sqlalchemy as sa
+# Custom Imports
+from example_com.data.modelbase import SqlAlchemyBase
+
+
+class ProjectMember(SqlAlchemyBase):
+    __tablename__ = 'project_members'
+    __table_args__ = (
+        # Serves "projects I belong to", the primary key serves "members of a project"
+        sa.Index('ix_project_members_username_project_id', 'username', 'project_id'),
+    )
+
+    project_id = sa.Column(sa.Integer, sa.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    username = sa.Column(sa.String, sa.ForeignKey("users.username", ondelete="CASCADE"), primary_key=True)
+    added_at = sa.Column(sa.DateTime, default=datetime.datetime.now)
@@ -2,21 +2,34 @@
 import datetime
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
+from sqlalchemy.dialects.postgresql import TSVECTOR
 # Custom Imports
 from example_com.data.modelbase import SqlAlchemyBase
 
 
 class Project(SqlAlchemyBase):
     __tablename__ = 'projects'
+    __table_args__ = (
+        # Serves the owner's project listing, newest first, with keyset pagination
+        sa.Index('ix_projects_owner_id', 'owner', 'id'),
+        # Creates rely on this to detect duplicates with ON CONFLICT
+        sa.UniqueConstraint('owner', 'project_name', name='uq_projects_owner_project_name'),
+        sa.Index('ix_projects_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id = sa.Column(sa.Integer, primary_key=True)
     project_name = sa.Column(sa.String, nullable=False)
     project_summary = sa.Column(sa.String)
     owner = sa.Column(sa.String, sa.ForeignKey("users.username"))
-    members = sa.Column(sa.ARRAY(sa.String))
     project_profile_img = sa.Column(sa.String)
     created_at = sa.Column(sa.DateTime, default=datetime.datetime.now)
-    updated_at = sa.Column(sa.DateTime, default=datetime.datetime.now)
+    updated_at = sa.Column(sa.DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+    # Bumped by every UPDATE, compared against If-Match
+    version = sa.Column(sa.Integer, nullable=False, default=1)
+    # Maintained by Postgres from name and summary, only read by searches
+    search_vector = orm.deferred(sa.Column(TSVECTOR, sa.Computed(
+        "setweight(to_tsvector('english', coalesce(project_name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(project_summary, '')), 'B')", persisted=True)))
 
     # Relationships
     user = orm.relation('User')
@@ -0,0 +1,311 @@
+# Imports
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from fastapi_cache import FastAPICache
+from functools import wraps
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+# Custom Imports
+from example_com.data import db_session
+from example_com.infrastructure import metrics
+from example_com.infrastructure import redis
+from example_com.infrastructure.conditional import is_conditional, is_not_modified, not_modified
+from example_com.infrastructure.jwt_token_auth import decode_auth_value
+from example_com.infrastructure.serialization import render_json
+from example_com.infrastructure.two_tier_cache import TwoTierBackend
+from example_com.infrastructure.unit_of_work import UnitOfWork
+from example_com.models.validation import ValidationError
+
+log = logging.getLogger("uvicorn")
+
+# Response headers kept with a cached body so hits can still answer conditional requests
+CACHED_HEADERS = ("ETag", "Last-Modified")
+# Bumped when what a cached entry holds changes, entries of another format are misses
+ENTRY_FORMAT = 2
+# Left out of the request a background refresh runs with, it must compute the full response
+CONDITIONAL_HEADERS = (b"if-none-match", b"if-modified-since")
+
+# Held by the replica computing a missing entry, the others wait for its result
+FILL_LOCK_KEY = "cache-fill-lock:{}"
+FILL_LOCK_TTL_MS = 5_000
+FILL_POLL_INTERVAL = 0.05
+
+# Computations running in this worker by cache key, concurrent misses share them
+__in_flight: Dict[str, asyncio.Future] = {}
+# Background refreshes, referenced until they finish so they are not garbage collected
+__refreshes: Set[asyncio.Task] = set()
+
+
+async def tome_key_builder(
+        func,
+        namespace: Optional[str] = "",
+        request: Optional[Request] = None,
+        response: Optional[Response] = None,
+        args: Optional[tuple] = None,
+        kwargs: Optional[dict] = None,
+):
+    """ Build the cache key from the endpoint, the caller and the requested URL, None when it can't be cached """
+    payload = getattr(request.state, "token_payload", None) if request else None
+    auth_header = request.headers.get("authorization") if request else None
+    if not payload and auth_header:
+        try:
+            payload = await decode_auth_value(auth_header.split()[-1])
+        except ValidationError:
+            return None
+
+    username = payload.get("username") if payload else None
+    url = f"{request.url.path}?{request.url.query}" if request else f"{args}:{kwargs}"
+
+    prefix = f"{FastAPICache.get_prefix()}:{namespace}:"
+    cache_key = (
+            prefix
+            + hashlib.md5(f"{func.__module__}:{func.__name__}:{username}:{url}".encode('utf-8'))
+            .hexdigest()
+    )
+
+    return cache_key
+
+
+def cache(
+        expire: Optional[int] = None,
+        key_builder: Optional[Callable] = None,
+        namespace: Optional[str] = "",
+        tags: Optional[Callable[[dict], List[str]]] = None,
+        stale_ttl: int = 0,
+):
+    """
+    Cache the JSON response of a GET endpoint. Unlike fastapi_cache's decorator the key builder
+    is awaited, so building the key never blocks the event loop.
+
+    tags receives the endpoint's keyword arguments and names the tags the response is stored under,
+    writes drop it with cache_tags.invalidate(). ETag and Last-Modified set on the endpoint's
+    `response` are cached with the body.
+
+    A miss is computed once per worker however many requests wait for it, and by one replica at a time
+    while it holds the fill lock. stale_ttl keeps an expired entry that many seconds longer, it is served
+    while a background task computes the fresh one. Invalidated entries are never served stale.
+
+    Entries hold the headers and the body rendered with orjson, so a hit is served without decoding the
+    body. Return the endpoint's response model, it decides which fields are cached.
+
+    The endpoint must accept a `request: Request` argument.
+    """
+
+    def wrapper(func):
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            request: Optional[Request] = kwargs.get("request")
+            if not request or request.method != "GET" or not FastAPICache.get_enable() \
+                    or request.headers.get("Cache-Control") == "no-store":
+                return await func(*args, **kwargs)
+
+            builder = key_builder or FastAPICache.get_key_builder()
+            backend = FastAPICache.get_backend()
+            entry_expire = expire or FastAPICache.get_expire()
+
+            cache_key = builder(func, namespace, request=request, response=kwargs.get("response"),
+                                args=args, kwargs=kwargs)
+            if inspect.isawaitable(cache_key):
+                cache_key = await cache_key
+            if not cache_key:
+                return await func(*args, **kwargs)
+
+            async def compute(call_kwargs: dict):
+                # Read before running the endpoint, a write landing in between then keeps the result out
+                entry_tags = tags(call_kwargs) if tags else []
+                versions = await redis.tag_versions(entry_tags)
+
+                if db_session.has_replicas() and await redis.tags_recently_written(entry_tags):
+                    # A replica may not have the write yet, this entry would keep its old state until it expires
+                    async with UnitOfWork() as primary:
+                        ret = await func(*args, **with_session(call_kwargs, primary.session))
+                else:
+                    ret = await func(*args, **call_kwargs)
+                if isinstance(ret, Response):
+                    return ret
+
+                value = encode_entry(call_kwargs.get("response"), render_json(ret).decode("utf-8"), entry_expire)
+                if entry_tags and isinstance(backend, TwoTierBackend):
+                    await backend.set_tagged(cache_key, value, entry_expire + stale_ttl, entry_tags, versions)
+                elif entry_tags:
+                    await redis.set_tagged(cache_key, value, entry_expire + stale_ttl, entry_tags, versions)
+                else:
+                    await backend.set(cache_key, value, entry_expire + stale_ttl)
+
+                return value
+
+            async def refresh():
+                if isinstance(backend, TwoTierBackend):
+                    # Another worker may have refreshed redis already and only this worker's copy is stale
+                    backend.evict([cache_key])
+                    current = decode_entry(await backend.get(cache_key))
+                    if current and is_fresh(current[0]):
+                        return None
+
+                # The request's unit of work is closed by now, the refresh reads through its own
+                async with UnitOfWork() as unit_of_work:
+                    return await fill(backend, cache_key, lambda: compute(background_kwargs(kwargs, unit_of_work)),
+                                      wait=False)
+
+            entry = decode_entry(await backend.get(cache_key))
+            if entry:
+                fresh = is_fresh(entry[0])
+                metrics.RESPONSE_CACHE_LOOKUPS.labels(namespace, "hit" if fresh else "stale").inc()
+                if not fresh:
+                    revalidate(cache_key, refresh)
+                return cached_response(request, *entry)
+
+            metrics.RESPONSE_CACHE_LOOKUPS.labels(namespace, "miss").inc()
+
+            if is_conditional(request):
+                # A revalidation mostly ends in a 304 that writes no entry, other replicas would wait on its lock
+                result, shared = await compute(kwargs), False
+            else:
+                result, shared = await single_flight(
+                    cache_key, lambda: fill(backend, cache_key, lambda: compute(kwargs), wait=True))
+            if isinstance(result, str):
+                return cached_response(request, *decode_entry(result))
+            # Responses the endpoint built itself are not cached or shared, each request gets its own
+            if shared:
+                return await func(*args, **kwargs)
+
+            return result
+
+        return inner
+
+    return wrapper
+
+
+async def single_flight(key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+    """ Run compute once for concurrent callers of the same key, returns its result and whether it was shared """
+    flight = __in_flight.get(key)
+    if flight is not None:
+        return await asyncio.shield(flight), True
+
+    flight = asyncio.ensure_future(compute())
+    __in_flight[key] = flight
+    flight.add_done_callback(lambda _: __in_flight.pop(key, None))
+
+    # A caller that goes away does not cancel the computation the others wait for
+    return await asyncio.shield(flight), False
+
+
+async def fill(backend, cache_key: str, compute: Callable[[], Awaitable[Any]], wait: bool) -> Any:
+    """
+    Compute a missing entry while holding the fill lock. Without the lock, wait for the holder's entry
+    and compute it anyway if none shows up in time, or give up when wait is False.
+    """
+    lock_key = FILL_LOCK_KEY.format(cache_key)
+    token = await redis.acquire_lock(lock_key, FILL_LOCK_TTL_MS)
+    if not token:
+        if not wait:
+            return None
+
+        value = await wait_for_entry(backend, cache_key, lock_key)
+        if value is not None:
+            return value
+
+    try:
+        return await compute()
+    finally:
+        if token:
+            await redis.release_lock(lock_key, token)
+
+
+async def wait_for_entry(backend, cache_key: str, lock_key: str) -> Optional[str]:
+    """ The entry the lock holder stores, None once the lock is released without one or expires """
+    deadline = time.monotonic() + FILL_LOCK_TTL_MS / 1000
+    while time.monotonic() < deadline:
+        await asyncio.sleep(FILL_POLL_INTERVAL)
+        # Checked before the entry, a holder that stored one and released the lock in between is not missed
+        held = await redis.lock_held(lock_key)
+        value = await backend.get(cache_key)
+        entry = decode_entry(value)
+        if entry and is_fresh(entry[0]):
+            return value
+        # The holder's endpoint answered with its own response (304, 404, ...), nothing will be stored
+        if not held:
+            return None
+
+    return None
+
+
+def revalidate(cache_key: str, refresh: Callable[[], Awaitable[Any]]):
+    """ Refresh a stale entry in the background unless this worker is computing it already """
+    if cache_key in __in_flight:
+        return
+
+    task = asyncio.ensure_future(single_flight(cache_key, refresh))
+    __refreshes.add(task)
+    task.add_done_callback(finish_refresh)
+
+
+def finish_refresh(task: asyncio.Task):
+    __refreshes.discard(task)
+    if not task.cancelled() and task.exception():
+        log.warning(f"Could not refresh a stale cache entry: {task.exception()}")
+
+
+def background_kwargs(kwargs: dict, unit_of_work: UnitOfWork) -> dict:
+    """
+    The endpoint's arguments for a refresh that outlives the request, without its conditional headers and
+    with the session of the refresh's own unit of work
+    """
+    request: Request = kwargs["request"]
+    scope = dict(request.scope)
+    scope["headers"] = [(name, value) for name, value in request.scope["headers"] if name not in CONDITIONAL_HEADERS]
+    scope["state"] = dict(request.scope.get("state", {}), unit_of_work=unit_of_work)
+
+    refreshed = with_session(dict(kwargs, request=Request(scope)), unit_of_work.session)
+    if "response" in kwargs:
+        refreshed["response"] = Response()
+
+    return refreshed
+
+
+def with_session(kwargs: dict, session: AsyncSession) -> dict:
+    """ The endpoint's arguments with session in place of the request's """
+    return {name: session if isinstance(value, AsyncSession) else value for name, value in kwargs.items()}
+
+
+def encode_entry(response: Optional[Response], body: str, expire: int) -> str:
+    headers = {name: response.headers[name] for name in CACHED_HEADERS
+               if response is not None and name in response.headers}
+    head = {"format": ENTRY_FORMAT, "headers": headers, "fresh_until": time.time() + expire}
+
+    # JSON never contains a raw newline, it separates the head from the body
+    return json.dumps(head) + "\n" + body
+
+
+def decode_entry(value: Optional[str]) -> Optional[Tuple[dict, str]]:
+    if value is None or "\n" not in value:
+        return None
+
+    head, body = value.split("\n", 1)
+    head = json.loads(head)
+    # Entries written in another format count as misses
+    if not isinstance(head, dict) or head.get("format") != ENTRY_FORMAT:
+        return None
+
+    return head, body
+
+
+def is_fresh(head: dict) -> bool:
+    return head["fresh_until"] > time.time()
+
+
+def cached_response(request: Request, head: dict, body: str) -> Response:
+    headers = head["headers"]
+    if "ETag" in headers:
+        last_modified = parsedate_to_datetime(headers["Last-Modified"]) if "Last-Modified" in headers else None
+        if is_not_modified(request, headers["ETag"], last_modified):
+            return not_modified(headers["ETag"], last_modified)
+
+    return Response(content=body, headers=headers, media_type="application/json")
@@ -0,0 +1,45 @@
+# Imports
+import logging
+from fastapi_cache import FastAPICache
+from typing import Iterable
+# Custom Imports
+from example_com.config import get_settings
+from example_com.data import db_session
+from example_com.infrastructure import redis
+from example_com.infrastructure.two_tier_cache import TwoTierBackend
+
+log = logging.getLogger("uvicorn")
+
+
+def user_tag(username: str) -> str:
+    """ The account of the user """
+    return f"user:{username}"
+
+
+def user_projects_tag(username: str) -> str:
+    """ Project listings of the user, owned and member of """
+    return f"user:{username}:projects"
+
+
+def project_tag(id: int) -> str:
+    return f"project:{id}"
+
+
+def members_projects_tags(members: Iterable[str]) -> list:
+    """ Listings that show a project through its members """
+    return [user_projects_tag(member) for member in members]
+
+
+async def invalidate(*tags: str):
+    """ Drop the cached responses under the tags, called after the write that changed them has committed """
+    try:
+        # With replicas, entries refilled within the read-your-writes window have to read the primary
+        written_ms = int(get_settings().read_your_writes_window * 1000) if db_session.has_replicas() else 0
+        keys = await redis.invalidate_tags(*dict.fromkeys(tags), written_ms=written_ms)
+        # Workers keep their own copies in front of redis
+        backend = FastAPICache.get_backend()
+        if isinstance(backend, TwoTierBackend):
+            await backend.invalidate(keys)
+    except Exception as ex:
+        # The entries still expire, a failed invalidation must not fail the write that already happened
+        log.warning(f"Could not invalidate cache tags {tags}: {ex}")
@@ -0,0 +1,91 @@
+# Imports
+import datetime
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from starlette.requests import Request
+from starlette.responses import Response
+from typing import Iterable, Optional, Tuple
+# Custom Imports
+from example_com.models.validation import ValidationError
+
+
+def version_etag(version: int) -> str:
+    """ Strong ETag of a row version, clients send it back in If-Match """
+    return f'"{version}"'
+
+
+def timestamp_etag(updated_at: datetime.datetime) -> str:
+    """ Weak ETag of a row that has no version column but keeps updated_at current """
+    return f'W/"{int(updated_at.timestamp() * 1_000_000)}"'
+
+
+def page_etag(rows: Iterable[Tuple[int, int]], *params) -> str:
+    """ Weak ETag of a list page from the (id, version) of its rows and the parameters that select it """
+    digest = hashlib.md5(repr((list(rows), params)).encode("utf-8")).hexdigest()
+
+    return f'W/"{digest}"'
+
+
+def http_date(moment: datetime.datetime) -> str:
+    # Timestamps are stored as naive local time
+    return format_datetime(moment.astimezone(datetime.timezone.utc), usegmt=True)
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """ The row version an If-Match header requires, None when any version is acceptable """
+    if if_match is None or if_match.strip() == "*":
+        return None
+
+    etag = if_match.strip()
+    if etag.startswith('"') and etag.endswith('"') and etag[1:-1].isdigit():
+        return int(etag[1:-1])
+
+    # Weak, listed or foreign tags can never match a strong version tag
+    raise ValidationError(error_msg="The If-Match header does not match.", status_code=412)
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime.datetime] = None) -> bool:
+    """ Whether the client's copy is current, If-None-Match wins over If-Modified-Since as in RFC 7232 """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+
+        # GET compares weakly, W/"x" matches "x"
+        tags = {strip_weak(tag.strip()) for tag in if_none_match.split(",")}
+        return strip_weak(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+
+        # HTTP dates have whole seconds
+        return last_modified.astimezone(datetime.timezone.utc).replace(microsecond=0) <= since
+
+    return False
+
+
+def strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime.datetime] = None):
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime.datetime] = None) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+
+    return response
@@ -0,0 +1,139 @@
+# Imports
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+from passlib.handlers.pbkdf2 import pbkdf2_sha256, pbkdf2_sha512
+from passlib.handlers.sha2_crypt import sha256_crypt, sha512_crypt
+from typing import List, Optional
+# Custom Imports
+from example_com.models.validation import ValidationError
+
+# Password hashers selectable through the PASSWORD_SCHEMES setting
+HASHERS = {
+    "sha512_crypt": sha512_crypt,
+    "sha256_crypt": sha256_crypt,
+    "pbkdf2_sha512": pbkdf2_sha512,
+    "pbkdf2_sha256": pbkdf2_sha256,
+}
+DEFAULT_SCHEMES = ["sha512_crypt"]
+DEFAULT_ROUNDS = 184_597
+
+__context: Optional[CryptContext] = None
+__executor: Optional[ProcessPoolExecutor] = None
+__capacity: int = 0
+__in_flight: int = 0
+
+
+def build_context(schemes: List[str], rounds: int) -> CryptContext:
+    """
+    Build the passlib context for the configured schemes. New hashes use the first scheme at the
+    given cost; hashes made with any other scheme or a lower cost are reported as outdated.
+    """
+    unknown = [scheme for scheme in schemes if scheme not in HASHERS]
+    if not schemes or unknown:
+        raise ValueError(f"Unsupported password schemes {unknown}, choose from {list(HASHERS)}")
+
+    default = schemes[0]
+    policy = {
+        f"{default}__default_rounds": rounds,
+        f"{default}__min_rounds": rounds
+    }
+
+    return CryptContext(schemes=[HASHERS[scheme] for scheme in schemes], default=default,
+                        deprecated=schemes[1:], **policy)
+
+
+def global_init(workers: int, queue_size: int, schemes: Optional[List[str]] = None,
+                rounds: int = DEFAULT_ROUNDS):
+    """
+    Configure the password hasher and start the process pool that runs it off the event loop
+
+    :param workers: Worker processes, 0 hashes inline on the event loop
+    :param queue_size: Calls allowed to wait for a free worker before new ones get a 503
+    :param schemes: Hasher names from HASHERS, the first one hashes new passwords
+    :param rounds: Cost of the default hasher
+    """
+    global __executor, __capacity
+
+    schemes = schemes or DEFAULT_SCHEMES
+    _init_context(schemes, rounds)
+
+    if __executor or workers <= 0:
+        return
+
+    __executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_context, initargs=(schemes, rounds))
+    __capacity = workers + queue_size
+
+
+def global_close():
+    global __executor
+
+    if not __executor:
+        return
+
+    __executor.shutdown(wait=False)
+    __executor = None
+
+
+def stats() -> dict:
+    return {
+        "pooled": __executor is not None,
+        "capacity": __capacity,
+        "in_flight": __in_flight
+    }
+
+
+def needs_update(hashed_password: str) -> bool:
+    """ Whether the hash was made with an outdated scheme or cost and should be re-hashed """
+    try:
+        return _get_context().needs_update(hashed_password)
+    except ValueError:
+        return False
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await _run(_verify, password, hashed_password)
+
+
+async def _run(fn, *args):
+    global __in_flight
+
+    if not __executor:
+        return fn(*args)
+
+    if __in_flight >= __capacity:
+        raise ValidationError(error_msg="Server is busy, please try again.", status_code=503)
+
+    __in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(__executor, fn, *args)
+    finally:
+        __in_flight -= 1
+
+
+def _init_context(schemes: List[str], rounds: int):
+    global __context
+
+    __context = build_context(schemes, rounds)
+
+
+def _get_context() -> CryptContext:
+    if not __context:
+        _init_context(DEFAULT_SCHEMES, DEFAULT_ROUNDS)
+
+    return __context
+
+
+def _hash(password: str) -> str:
+    return _get_context().hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    try:
+        return _get_context().verify(password, hashed_password)
+    except ValueError:
+        return False
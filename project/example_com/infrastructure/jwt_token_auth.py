@@ -1,17 +1,58 @@
 # Imports
 import fastapi
+import hashlib
+import hmac
 import jwt
+import time
 from datetime import datetime, timedelta
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
 from typing import Optional
 # Custom Imports
+from example_com.infrastructure import principal_cache
+from example_com.infrastructure.ttl_cache import TTLCache
+from example_com.infrastructure.unit_of_work import get_session
 from example_com.services import user_service
 from example_com.models.validation import ValidationError
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 JWT_SECRET: Optional[str] = None
 
+__payloads = TTLCache(maxsize=10_000, ttl=300)
+
+
+def configure_token_cache(maxsize: int, ttl: float):
+    global __payloads
+
+    __payloads = TTLCache(maxsize=maxsize, ttl=ttl)
+
+
+def token_cache_stats() -> dict:
+    return __payloads.stats()
+
+
+def decode_token(token: str) -> dict:
+    """
+    Validate the token and return its payload, reusing the payload of a token validated before.
+    Entries never outlive the token's exp claim, and the digest is keyed by JWT_SECRET so a
+    rotated secret never matches payloads validated with the old one.
+    """
+    digest = hmac.new((JWT_SECRET or "").encode("utf-8"), token.encode("utf-8"), hashlib.sha256).hexdigest()
+    payload = __payloads.get(digest)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+
+    ttl = __payloads.ttl
+    if payload.get('exp') is not None:
+        ttl = min(ttl, payload['exp'] - time.time())
+    __payloads.set(digest, payload, ttl=ttl)
+
+    return payload
+
 
 def set_token(username: str):
     payload = {
@@ -25,24 +66,36 @@ def set_token(username: str):
     return jwt_token
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme),
+                           session: AsyncSession = Depends(get_session)):
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        user = await user_service.find_user_by_username(username=payload.get('username'))
+        payload = decode_token(token)
+        # Shared with the cache key builder so the token is only decoded once per request
+        request.state.token_payload = payload
+
+        username = payload.get('username')
+        user = principal_cache.get(username)
+        if user:
+            return user
+
+        generation = principal_cache.generation()
+        user = await user_service.find_user_by_username(session, username=username)
         if not user:
             raise ValidationError(error_msg="Incorrect username or password", status_code=401)
 
+        principal_cache.put(user, generation)
+
         return user
 
-    except jwt.exceptions.DecodeError:
+    except jwt.exceptions.InvalidTokenError:
         return fastapi.Response(content="Invalid token", status_code=401)
 
 
 async def decode_auth_value(token):
     """ Decode authorization token to get payload """
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-    except jwt.exceptions.DecodeError:
+        payload = decode_token(token)
+    except jwt.exceptions.InvalidTokenError:
         raise ValidationError(error_msg="Invalid token", status_code=401)
 
     return payload
@@ -0,0 +1,93 @@
+# Imports
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest
+from prometheus_client import multiprocess
+from typing import Tuple
+
+# Set by gunicorn.conf.py. Every worker then writes its samples to files in this directory and /metrics
+# aggregates them, otherwise each scrape would only see the worker that answered it.
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+# Requests that matched no route share one label, so unknown paths cannot grow the series without bound
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_REQUESTS = Counter("http_requests", "Requests answered", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time to answer a request",
+                                  ["method", "route"])
+
+DB_STATEMENT_DURATION = Histogram("db_statement_duration_seconds", "Time to execute a SQL statement",
+                                  ["operation"],
+                                  buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+DB_POOL_CHECKOUT_WAIT = Histogram("db_pool_checkout_wait_seconds", "Time waited for a pooled connection",
+                                  ["engine"],
+                                  buckets=(.0001, .001, .005, .01, .05, .1, .5, 1, 5, 30))
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Pooled connections in use", ["engine"],
+                            multiprocess_mode="livesum")
+
+REDIS_COMMAND_DURATION = Histogram("redis_command_duration_seconds", "Time to run a redis command", ["command"],
+                                   buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1))
+REDIS_COMMAND_ERRORS = Counter("redis_command_errors", "Redis commands that raised", ["command"])
+
+RESPONSE_CACHE_LOOKUPS = Counter("response_cache_lookups", "Cached endpoint lookups by result (hit, stale, miss)",
+                                 ["namespace", "result"])
+
+
+def render() -> Tuple[bytes, str]:
+    """ Every metric in the text exposition format, with its content type """
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def statement_operation(statement: str) -> str:
+    """ The statement's leading keyword, a bounded label unlike the statement itself """
+    words = statement.lstrip().split(None, 1)
+
+    return words[0].upper() if words else "UNKNOWN"
+
+
+class MetricsMiddleware:
+    """ Count every request and time it, labelled with the template of the route that served it """
+
+    def __init__(self, app):
+        self.app = app
+        self.templates = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self.route_template(scope)
+            HTTP_REQUEST_DURATION.labels(scope["method"], route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status)).inc()
+
+    def route_template(self, scope) -> str:
+        # The router leaves the matched endpoint in the scope, its route holds the template
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+
+        template = self.templates.get(endpoint)
+        if template is None:
+            template = next((route.path for route in scope["app"].routes
+                             if getattr(route, "endpoint", None) is endpoint), UNMATCHED_ROUTE)
+            self.templates[endpoint] = template
+
+        return template
@@ -0,0 +1,51 @@
+# Imports
+from typing import Optional
+# Custom Imports
+from example_com.data.account.users import User
+from example_com.infrastructure import redis
+from example_com.infrastructure.ttl_cache import TTLCache
+
+INVALIDATION_CHANNEL = "principal-invalidate"
+
+__principals = TTLCache(maxsize=10_000, ttl=60)
+__generation = 0
+
+
+def global_init(maxsize: int, ttl: float):
+    global __principals
+
+    __principals = TTLCache(maxsize=maxsize, ttl=ttl)
+    redis.subscribe(INVALIDATION_CHANNEL, evict)
+
+
+def generation() -> int:
+    """ Take before loading a principal and hand to put() so a load racing an invalidation is dropped """
+    return __generation
+
+
+def get(username: str) -> Optional[User]:
+    return __principals.get(username)
+
+
+def put(user: User, loaded_at_generation: int):
+    if loaded_at_generation != __generation:
+        return
+
+    __principals.set(user.username, user)
+
+
+def evict(username: str):
+    global __generation
+
+    __generation += 1
+    __principals.pop(username)
+
+
+async def invalidate(username: str):
+    """ Drop the principal here and on every other replica """
+    evict(username)
+    await redis.publish(INVALIDATION_CHANNEL, username)
+
+
+def stats() -> dict:
+    return __principals.stats()
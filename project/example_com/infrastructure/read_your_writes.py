@@ -0,0 +1,33 @@
+# Imports
+from typing import Optional
+# Custom Imports
+from example_com.infrastructure import redis
+from example_com.infrastructure.ttl_cache import TTLCache
+
+WRITES_CHANNEL = "read-your-writes"
+# Users who wrote within the window, one entry each
+MAX_WRITERS = 100_000
+
+__writers = TTLCache(maxsize=MAX_WRITERS, ttl=5)
+
+
+def global_init(window: float):
+    global __writers
+
+    __writers = TTLCache(maxsize=MAX_WRITERS, ttl=window)
+    redis.subscribe(WRITES_CHANNEL, remember)
+
+
+def remember(username: str):
+    __writers.set(username, True)
+
+
+def reads_primary(username: Optional[str]) -> bool:
+    """ Whether the user wrote recently enough that a replica may not have the write yet """
+    return username is not None and __writers.get(username) is not None
+
+
+async def record_write(username: str):
+    """ Keep the user's reads on the primary for the window, here and in every other worker """
+    remember(username)
+    await redis.publish(WRITES_CHANNEL, username)
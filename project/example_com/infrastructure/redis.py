@@ -1,55 +1,254 @@
 # Imports
 import aioredis
-import hashlib
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+# Custom Imports
+from example_com.infrastructure import metrics
+
+log = logging.getLogger("uvicorn")
+
+__redis: Optional[aioredis.Redis] = None
+__set_tagged_script = None
+__invalidate_tags_script = None
+__release_lock_script = None
+__subscriptions: Dict[str, Callable[[str], None]] = {}
+__listener: Optional[asyncio.Task] = None
+REDIS_URL: str = "redis://localhost"
+
+# Tagged response cache entries. Each tag has a set of the entry keys stored under it and a version that
+# every invalidation bumps, so an entry computed while its tag was invalidated is never stored.
+TAG_SET_KEY = "cache-tag:{}"
+TAG_VERSION_KEY = "cache-tag-version:{}"
+# Set for a while after a tag is invalidated, fills of its entries then read the primary, not a lagging replica
+TAG_WRITTEN_KEY = "cache-tag-written:{}"
+# Versions only have to outlive the requests that read them
+TAG_VERSION_TTL = 86_400
+
+# Store an entry and add it to its tags, unless a tag moved past the version read before computing it.
+#   KEYS[1] - entry key, KEYS[2 .. n + 1] - tag sets, KEYS[n + 2 .. 2n + 1] - tag versions
+#   ARGV[1] - value, ARGV[2] - expire seconds, ARGV[3 ..] - tag versions read before the miss
+SET_TAGGED_LUA = """
+local n = (#KEYS - 1) / 2
+for i = 1, n do
+    if (redis.call('GET', KEYS[1 + n + i]) or '0') ~= ARGV[2 + i] then
+        return 0
+    end
+end
+local expire = tonumber(ARGV[2])
+redis.call('SET', KEYS[1], ARGV[1], 'EX', expire)
+for i = 1, n do
+    redis.call('SADD', KEYS[1 + i], KEYS[1])
+    if redis.call('TTL', KEYS[1 + i]) < expire then
+        redis.call('EXPIRE', KEYS[1 + i], expire)
+    end
+end
+return 1
+"""
+
+# Drop every entry stored under the tags and bump their versions in one round-trip, returns the entry keys.
+#   KEYS[1 .. n] - tag sets, KEYS[n + 1 .. 2n] - tag versions, KEYS[2n + 1 .. 3n] - tag written markers
+#   ARGV[1] - tag version ttl, ARGV[2] - milliseconds the written markers last, 0 sets none
+INVALIDATE_TAGS_LUA = """
+local n = #KEYS / 3
+local written_ms = tonumber(ARGV[2])
+local dropped = {}
+for i = 1, n do
+    local entries = redis.call('SMEMBERS', KEYS[i])
+    for j = 1, #entries, 1000 do
+        redis.call('DEL', unpack(entries, j, math.min(j + 999, #entries)))
+    end
+    for _, entry in ipairs(entries) do
+        dropped[#dropped + 1] = entry
+    end
+    redis.call('DEL', KEYS[i])
+    redis.call('INCR', KEYS[n + i])
+    redis.call('EXPIRE', KEYS[n + i], ARGV[1])
+    if written_ms > 0 then
+        redis.call('SET', KEYS[2 * n + i], '1', 'PX', written_ms)
+    end
+end
+return dropped
+"""
+
+# Delete a lock only while it is still held with the caller's token, it may have expired and been taken since.
+#   KEYS[1] - lock, ARGV[1] - token
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class TimedRedis(aioredis.Redis):
+    """ Redis client that times every command it sends, the response cache backend and Lua scripts included """
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).lower()
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            metrics.REDIS_COMMAND_ERRORS.labels(command).inc()
+            raise
+        finally:
+            metrics.REDIS_COMMAND_DURATION.labels(command).observe(time.perf_counter() - start)
+
+
+async def global_init(url: Optional[str] = None, max_connections: Optional[int] = None):
+    global __redis, __set_tagged_script, __invalidate_tags_script, __release_lock_script
+
+    if __redis:
+        return
+
+    __redis = TimedRedis.from_url(url or REDIS_URL, encoding="utf-8", decode_responses=True,
+                                  max_connections=max_connections)
+    __set_tagged_script = __redis.register_script(SET_TAGGED_LUA)
+    __invalidate_tags_script = __redis.register_script(INVALIDATE_TAGS_LUA)
+    __release_lock_script = __redis.register_script(RELEASE_LOCK_LUA)
+
+
+async def global_close():
+    global __redis, __set_tagged_script, __invalidate_tags_script, __release_lock_script
+
+    if not __redis:
+        return
+
+    await stop_listener()
+    await __redis.close()
+    await __redis.connection_pool.disconnect()
+    __redis = None
+    __set_tagged_script = None
+    __invalidate_tags_script = None
+    __release_lock_script = None
+
+
+def get_redis() -> aioredis.Redis:
+    global __redis
+
+    if not __redis:
+        raise Exception("You must call global_init() before using this method")
+
+    return __redis
+
 
+async def ping() -> bool:
+    try:
+        await get_redis().ping()
+    except Exception as ex:
+        log.warning(f"Redis is not reachable: {ex}")
+        return False
 
-async def check_master_hash(name, namespace, token, cache_key):
-    redis = aioredis.from_url("redis://localhost")
-    master_hash = hashlib.md5(f"{token}".encode('utf-8')).hexdigest()
+    return True
 
-    result = await redis.hgetall(name=name)
-    if not result:
-        await set_master_hash(name, master_hash)
 
-    result = await redis.hget(name, "master-key")
-    decoded_result = result.decode("utf-8")
-    if decoded_result != master_hash:
-        await clear_old_keys(name, namespace)
-        await clear_master_key(name, decoded_result)
-        await set_master_hash(name, master_hash)
-        keypair = {namespace: cache_key}
-        await set_endpoint_hash(name, **keypair)
+def subscribe(channel: str, handler: Callable[[str], None]):
+    """ Register a handler for a pub/sub channel, picked up by start_listener() """
+    __subscriptions[channel] = handler
 
 
-async def set_master_hash(name, masterkey):
-    redis = aioredis.from_url("redis://localhost")
+async def publish(channel: str, message: str):
+    await get_redis().publish(channel, message)
 
-    await redis.hset(name, key="master-key", value=masterkey)
 
+async def start_listener():
+    global __listener
 
-async def set_endpoint_hash(name, **kwargs):
-    redis = aioredis.from_url("redis://localhost")
+    if __listener or not __subscriptions:
+        return
 
-    for key, value in kwargs.items():
-        await redis.hset(name, key=key, value=value)
+    __listener = asyncio.create_task(_listen())
 
 
-async def clear_master_key(name, old_masterkey):
-    redis = aioredis.from_url("redis://localhost")
+async def stop_listener():
+    global __listener
 
-    await redis.hdel(name, old_masterkey)
+    if not __listener:
+        return
 
+    __listener.cancel()
+    try:
+        await __listener
+    except asyncio.CancelledError:
+        pass
+    __listener = None
 
-async def clear_old_keys(name, namespace):
-    redis = aioredis.from_url("redis://localhost")
 
-    master_keys = await redis.hkeys(name)
-    for mkey in master_keys:
-        decoded_mkey = mkey.decode("utf-8")
-        if decoded_mkey == "master-key":
-            continue
+async def _listen():
+    while True:
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(*__subscriptions)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
 
-        old_endpoint_bytes = await redis.hget(name, decoded_mkey)
-        old_endpoint_hash = old_endpoint_bytes.decode("utf-8")
+                handler = __subscriptions.get(message["channel"])
+                if handler:
+                    handler(message["data"])
 
-        await redis.delete(f"example:{namespace}:{old_endpoint_hash}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            log.warning(f"Redis subscription dropped, reconnecting: {ex}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
+
+
+async def tag_versions(tags: List[str]) -> List[str]:
+    """ Current versions of the tags, read before computing an entry that set_tagged() stores under them """
+    if not tags:
+        return []
+
+    versions = await get_redis().mget([TAG_VERSION_KEY.format(tag) for tag in tags])
+
+    return [version or "0" for version in versions]
+
+
+async def tags_recently_written(tags: List[str]) -> bool:
+    """ Whether any of the tags was invalidated within the written window given to invalidate_tags() """
+    if not tags:
+        return False
+
+    return any(await get_redis().mget([TAG_WRITTEN_KEY.format(tag) for tag in tags]))
+
+
+async def set_tagged(key: str, value: str, expire: int, tags: List[str], versions: List[str]) -> bool:
+    """ Store the entry under its tags, False when one of them was invalidated since versions were read """
+    get_redis()
+    keys = [key] + [TAG_SET_KEY.format(tag) for tag in tags] + [TAG_VERSION_KEY.format(tag) for tag in tags]
+
+    return bool(await __set_tagged_script(keys=keys, args=[value, expire, *versions]))
+
+
+async def invalidate_tags(*tags: str, written_ms: int = 0) -> List[str]:
+    """ Delete every entry stored under any of the tags, returns their keys. written_ms marks them as written. """
+    get_redis()
+    if not tags:
+        return []
+    keys = [TAG_SET_KEY.format(tag) for tag in tags] + [TAG_VERSION_KEY.format(tag) for tag in tags] + \
+           [TAG_WRITTEN_KEY.format(tag) for tag in tags]
+
+    return await __invalidate_tags_script(keys=keys, args=[TAG_VERSION_TTL, written_ms])
+
+
+async def acquire_lock(key: str, ttl_ms: int) -> Optional[str]:
+    """ Take a lock that expires on its own after ttl_ms, returns the token to release it with or None if held """
+    token = uuid.uuid4().hex
+    if await get_redis().set(key, token, nx=True, px=ttl_ms):
+        return token
+
+    return None
+
+
+async def release_lock(key: str, token: str):
+    get_redis()
+    await __release_lock_script(keys=[key], args=[token])
+
+
+async def lock_held(key: str) -> bool:
+    return bool(await get_redis().exists(key))
@@ -0,0 +1,29 @@
+# Imports
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from typing import Any
+
+
+def orjson_default(obj: Any) -> Any:
+    """ The fields of a response model for orjson, nested models come back here. Field aliases are not applied. """
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def render_json(content: Any) -> bytes:
+    """ Response models go straight to orjson, anything else through jsonable_encoder first as FastAPI does """
+    if isinstance(content, BaseModel):
+        return orjson.dumps(content, default=orjson_default)
+
+    return orjson.dumps(jsonable_encoder(content))
+
+
+class ModelResponse(ORJSONResponse):
+    """ Renders a response model without FastAPI's second validation and jsonable_encoder pass """
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
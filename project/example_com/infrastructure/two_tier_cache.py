@@ -0,0 +1,139 @@
+# Imports
+import json
+import logging
+import time
+from fastapi_cache.backends import Backend
+from fastapi_cache.backends.redis import RedisBackend
+from typing import List, Optional, Tuple
+# Custom Imports
+from example_com.infrastructure import redis
+from example_com.infrastructure.ttl_cache import TTLCache
+
+log = logging.getLogger("uvicorn")
+
+INVALIDATION_CHANNEL = "response-cache-invalidate"
+# Published instead of a key list when a whole tier is cleared
+CLEAR_ALL = "*"
+
+
+class CurrentRedisBackend(RedisBackend):
+    """ fastapi_cache's redis backend on the client of redis.global_init(), follows it when it is reopened """
+
+    def __init__(self):
+        pass
+
+    @property
+    def redis(self):
+        return redis.get_redis()
+
+
+class TwoTierBackend(Backend):
+    """
+    Response cache backend with a per-worker LRU (L1) in front of a shared backend (L2), usually redis
+
+    L1 hits skip the network round-trip. L1 entries never outlive their L2 entry and are dropped on every
+    worker of every replica through a redis channel when their keys are invalidated.
+
+    Attributes:
+        l1 (TTLCache): Entries of this worker with the time their L2 entry expires, bounded in size and lifetime
+        l2 (Backend): Shared backend the entries are read from and written to
+        l2_hits (int): L1 misses answered by L2
+        l2_misses (int): L1 misses that L2 could not answer either
+    """
+
+    def __init__(self, l2: Backend, maxsize: int, ttl: float):
+        self.l1 = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.l2 = l2
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self._generation = 0
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[str]]:
+        cached = self.l1.get(key)
+        if cached is not None:
+            # What is left of the L2 entry's lifetime, not of the shorter L1 copy
+            value, expires_at = cached
+            return (max(0, int(expires_at - time.monotonic())) if expires_at else -1), value
+
+        # An invalidation arriving while L2 answers must keep the answer out of L1
+        generation = self._generation
+        ttl, value = await self.l2.get_with_ttl(key)
+        if value is None:
+            self.l2_misses += 1
+            return ttl, None
+
+        self.l2_hits += 1
+        if generation == self._generation and ttl > 0:
+            self.l1.set(key, (value, time.monotonic() + ttl), min(ttl, self.l1.ttl))
+
+        return ttl, value
+
+    async def get(self, key: str) -> Optional[str]:
+        _, value = await self.get_with_ttl(key)
+
+        return value
+
+    async def set(self, key: str, value: str, expire: int = None):
+        generation = self._generation
+        await self.l2.set(key, value, expire)
+        self._fill(key, value, expire, generation)
+
+    async def set_tagged(self, key: str, value: str, expire: int, tags: List[str], versions: List[str]) -> bool:
+        """ Store the entry under its tags with redis.set_tagged(), L1 only keeps it when redis did """
+        generation = self._generation
+        stored = await redis.set_tagged(key, value, expire, tags, versions)
+        if stored:
+            self._fill(key, value, expire, generation)
+
+        return stored
+
+    async def clear(self, namespace: str = None, key: str = None) -> int:
+        cleared = await self.l2.clear(namespace, key)
+        await self.invalidate([key] if key else [CLEAR_ALL])
+
+        return cleared
+
+    async def invalidate(self, keys: List[str]):
+        """ Drop the keys from L1 here and on every other worker, L2 is left to the caller """
+        if not keys:
+            return
+
+        self.evict(keys)
+        await redis.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+
+    def on_invalidation(self, message: str):
+        try:
+            keys = json.loads(message)
+        except ValueError:
+            log.warning(f"Ignoring malformed response cache invalidation: {message}")
+            return
+
+        self.evict(keys)
+
+    def evict(self, keys: List[str]):
+        self._generation += 1
+        if CLEAR_ALL in keys:
+            self.l1.clear()
+            return
+
+        for key in keys:
+            self.l1.pop(key)
+
+    def stats(self) -> dict:
+        lookups = self.l2_hits + self.l2_misses
+
+        return {
+            "l1": self.l1.stats(),
+            "l2": {
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "hit_ratio": self.l2_hits / lookups if lookups else 0.0
+            }
+        }
+
+    def _fill(self, key: str, value: str, expire: Optional[int], generation: int):
+        if generation != self._generation:
+            return
+
+        expires_at = time.monotonic() + expire if expire else None
+        self.l1.set(key, (value, expires_at), min(expire, self.l1.ttl) if expire else self.l1.ttl)
@@ -0,0 +1,138 @@
+# Imports
+import logging
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
+from typing import Awaitable, Callable, Optional
+# Custom Imports
+from example_com.data import db_session
+from example_com.infrastructure import read_your_writes
+
+log = logging.getLogger("uvicorn")
+
+# Kept in session.info, the callbacks to run once the unit of work committed
+AFTER_COMMIT = "after_commit"
+# Kept in session.info, set when the request's writes must be dropped whatever the response
+ROLLBACK_ONLY = "rollback_only"
+# Requests that only read, their unit of work reads from a replica
+READ_METHODS = ("GET", "HEAD")
+
+
+class UnitOfWork:
+    """
+    The one database session of a request, opened on first use so requests answered from caches never
+    check out a connection. It is committed once at the end of the request, or closed without committing,
+    which rolls back everything the request wrote.
+
+    Given use_replica, the session reads from a replica when use_replica() is true at its first statement.
+    """
+
+    def __init__(self, use_replica: Optional[Callable[[], bool]] = None):
+        self._session: Optional[AsyncSession] = None
+        self._use_replica = use_replica
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            if self._use_replica:
+                self._session = db_session.create_routed_session(self._use_replica)
+            else:
+                self._session = db_session.create_session()
+
+        return self._session
+
+    async def commit(self) -> bool:
+        """ Commit unless marked rollback-only, then run the session's after-commit callbacks """
+        if self._session is None or self._session.info.pop(ROLLBACK_ONLY, False):
+            return False
+
+        await self._session.commit()
+
+        for callback in self._session.info.pop(AFTER_COMMIT, []):
+            try:
+                await callback()
+            except Exception as ex:
+                # The write already happened, a failed callback must not fail the request
+                log.warning(f"After-commit callback failed: {ex}")
+
+        return True
+
+    async def close(self):
+        """ Release the connection, rolling back anything not committed. Loaded objects stay usable. """
+        if self._session is None:
+            return
+
+        self._session.info.clear()
+        await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "UnitOfWork":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class UnitOfWorkRoute(APIRoute):
+    """
+    Route that runs its endpoint in a unit of work, committed before the response is sent unless the
+    response is an error. Dependencies with yield can't do this, FastAPI runs their exit after sending.
+
+    With replicas, GET and HEAD requests read from one unless the caller wrote within the read-your-writes
+    window, other requests use the primary and open that window for the caller when they commit.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+
+        async def unit_of_work_handler(request: Request) -> Response:
+            read_only = request.method in READ_METHODS
+            use_replica = None
+            if read_only and db_session.has_replicas():
+                # Asked at the first statement, get_current_user has decoded the token by then
+                use_replica = lambda: not read_your_writes.reads_primary(request_username(request))
+
+            async with UnitOfWork(use_replica) as unit_of_work:
+                request.state.unit_of_work = unit_of_work
+                response = await handler(request)
+                if response.status_code < 400 and await unit_of_work.commit() and not read_only:
+                    await record_write(request_username(request))
+
+            return response
+
+        return unit_of_work_handler
+
+
+def request_username(request: Request) -> Optional[str]:
+    """ The caller, once get_current_user decoded their token """
+    payload = getattr(request.state, "token_payload", None)
+
+    return payload.get("username") if payload else None
+
+
+async def record_write(username: Optional[str]):
+    """ Keep the user's reads on the primary for the read-your-writes window, when there are replicas """
+    if not username or not db_session.has_replicas():
+        return
+
+    try:
+        await read_your_writes.record_write(username)
+    except Exception as ex:
+        # Committed already, the caller may only read a lagging replica for a moment
+        log.warning(f"Could not record the write of {username}: {ex}")
+
+
+def get_session(request: Request) -> AsyncSession:
+    """ The session of the request's unit of work, as a FastAPI dependency """
+    return request.state.unit_of_work.session
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable]):
+    """ Run callback once the session's unit of work commits, never if it rolls back """
+    session.info.setdefault(AFTER_COMMIT, []).append(callback)
+
+
+def set_rollback_only(session: AsyncSession):
+    """ Roll back everything the request wrote instead of committing it, even with a successful response """
+    session.info[ROLLBACK_ONLY] = True
@@ -0,0 +1,47 @@
+# Imports
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+
+class AdminSettingsResponse(BaseModel):
+    environment: str
+    testing: bool
+    database_url: Optional[str]
+
+
+class CacheStatsResponse(BaseModel):
+    """ Counters of an in-process TTL cache """
+    size: int
+    maxsize: int
+    ttl: float
+    hits: int
+    misses: int
+    evictions: int
+    hit_ratio: float
+
+
+class HitStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class ResponseCacheStatsResponse(BaseModel):
+    l1: CacheStatsResponse
+    l2: HitStatsResponse
+
+
+class PoolStatsResponse(BaseModel):
+    pool_size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    wait_seconds_avg: float
+
+
+class DbPoolStatsResponse(PoolStatsResponse):
+    """ The primary's pool, and each replica's by name """
+    replicas: Dict[str, PoolStatsResponse] = {}
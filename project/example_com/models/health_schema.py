@@ -0,0 +1,14 @@
+# Imports
+from pydantic import BaseModel, Field
+
+
+class LivenessResponse(BaseModel):
+    status: str
+
+
+class ReadinessResponse(BaseModel):
+    status: str
+    database: bool
+    # "schema" would shadow BaseModel.schema()
+    schema_version: bool = Field(..., alias="schema")
+    redis: bool
@@ -0,0 +1,21 @@
+# Imports
+import base64
+import json
+# Custom Imports
+from example_com.models.validation import ValidationError
+
+
+def encode_cursor(last_id: int) -> str:
+    """ Opaque cursor pointing after the last id of a page ordered by id DESC """
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["id"]
+        if isinstance(last_id, int):
+            return last_id
+    except (ValueError, KeyError, TypeError):
+        pass
+
+    raise ValidationError(error_msg="Invalid cursor.", status_code=400)
@@ -1,9 +1,73 @@
 # Imports
-from pydantic import BaseModel, constr
-from typing import Optional
+import datetime
+from pydantic import BaseModel, conlist, constr
+from typing import List, Optional
+# Custom Imports
+from example_com.models.response_schema import ResponseSchema
 
 
 class ProjectModel(BaseModel):
     project_name: constr(strip_whitespace=True, min_length=1)
     project_summary: str
-    members: Optional[str] = []
+    # None leaves the members of an existing project as they are, a list replaces them
+    members: Optional[List[str]] = None
+
+
+class ProjectUpsertModel(BaseModel):
+    """ Body of PUT /api/workspaces/projects/by-name/{project_name}, the name comes from the path """
+    project_summary: str
+    members: Optional[List[str]] = None
+
+
+class ProjectMemberModel(BaseModel):
+    username: constr(strip_whitespace=True, min_length=1)
+
+
+# A bulk create is one transaction, keep it small enough not to hold locks for long
+MAX_BATCH_SIZE = 500
+
+ProjectBatch = conlist(ProjectModel, min_items=1, max_items=MAX_BATCH_SIZE)
+
+
+class ProjectResponse(ResponseSchema):
+    """ What the Projects API returns for a project, built straight from the selected row """
+    id: int
+    project_name: str
+    project_summary: str
+    owner: str
+    members: List[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    version: int
+
+
+class ProjectSearchResult(ProjectResponse):
+    rank: float
+
+
+class ProjectPage(BaseModel):
+    projects: List[ProjectResponse]
+    next_cursor: Optional[str]
+
+
+class ProjectSearchPage(BaseModel):
+    projects: List[ProjectSearchResult]
+    next_offset: Optional[int]
+
+
+class ProjectBatchResult(BaseModel):
+    """ Outcome of one item of a bulk create, the project when it was created and the error when not """
+    project_name: str
+    status_code: int
+    project: Optional[ProjectResponse] = None
+    error: Optional[str] = None
+
+
+class ProjectBatchResponse(BaseModel):
+    created: int
+    results: List[ProjectBatchResult]
+
+
+class ProjectMemberResponse(BaseModel):
+    project_id: int
+    username: str
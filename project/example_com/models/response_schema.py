@@ -0,0 +1,19 @@
+# Imports
+from pydantic import BaseModel
+
+
+class ResponseSchema(BaseModel):
+    """ Base of the response models built from query results """
+
+    class Config:
+        orm_mode = True
+        # Pages hold the models as they are instead of validating a copy of each
+        copy_on_model_validation = "none"
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        The model of a row or ORM object from our own queries. The columns already have their types, so
+        unlike from_orm() nothing is validated, and only the model's fields are read from the row.
+        """
+        return cls.construct(**{name: getattr(row, name) for name in cls.__fields__})
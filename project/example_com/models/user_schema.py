@@ -1,5 +1,9 @@
 # Imports
+import datetime
 from pydantic import BaseModel, EmailStr, constr
+from typing import Optional
+# Custom Imports
+from example_com.models.response_schema import ResponseSchema
 
 
 class BaseUserSchema(BaseModel):
@@ -16,3 +20,24 @@ class FullUserSchema(BaseUserSchema):
 class ResetPasswordSchema(BaseModel):
     old_password: constr(strip_whitespace=True, min_length=10)
     new_password: constr(strip_whitespace=True, min_length=10)
+
+
+class UserResponse(ResponseSchema):
+    """ What the Accounts API returns for a user, never the password hash """
+    id: int
+    first_name: str
+    last_name: str
+    username: str
+    email: str
+    profile_image_url: Optional[str]
+    confirmed: bool
+    confirmed_on: Optional[datetime.datetime]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    last_login: Optional[datetime.datetime]
+    is_admin: Optional[bool]
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str
@@ -1,5 +1,5 @@
-# Custom Imports
-from example_com.services import user_service
+# Imports
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 class ValidationError(Exception):
@@ -10,11 +10,14 @@ class ValidationError(Exception):
         self.error_msg = error_msg
 
 
-async def no_dups_validation(username: str, email: str):
-    user = await user_service.find_user_by_username(username)
+async def no_dups_validation(session: AsyncSession, username: str, email: str):
+    # Imported here, user_service and the infrastructure it uses raise ValidationError themselves
+    from example_com.services import user_service
+
+    user = await user_service.find_user_by_username(session, username)
     if user:
         raise ValidationError(f"The username '{username}' already exists.", status_code=403)
 
-    user = await user_service.find_user_by_email(email)
+    user = await user_service.find_user_by_email(session, email)
     if user:
         raise ValidationError(f"The email '{email}' already exists.", status_code=403)
@@ -1,88 +1,415 @@
 # Imports
-from typing import List, Optional
-from sqlalchemy import update, delete
+import datetime
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from sqlalchemy import func, literal_column, union, update, delete
+from sqlalchemy.engine import Row
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 # Custom Libraries
 from example_com.data import db_session
+from example_com.data.account.users import User
+from example_com.data.workspaces.project_members import ProjectMember
 from example_com.data.workspaces.projects import Project
-from example_com.models.project_schema import ProjectModel
+from example_com.infrastructure import cache_tags
+from example_com.infrastructure.unit_of_work import after_commit, set_rollback_only
+from example_com.models.project_schema import ProjectModel, ProjectUpsertModel
 from example_com.models.validation import ValidationError
 
+UNIQUE_NAME_CONSTRAINT = "uq_projects_owner_project_name"
 
-async def get_projects(owner: str) -> Optional[List[Project]]:
-    async with db_session.create_session() as session:
-        query = select(Project).filter(Project.owner == owner)
-        result = await session.execute(query)
 
-    return list(result)
+def members_column():
+    """ The project's member usernames as an array, read through the project_members primary key """
+    members = select(ProjectMember.username). \
+        filter(ProjectMember.project_id == Project.id). \
+        order_by(ProjectMember.username). \
+        correlate(Project). \
+        scalar_subquery()
 
+    return func.array(members).label("members")
 
-async def get_project_by_id(id: int, owner: str) -> Optional[Project]:
-    async with db_session.create_session() as session:
-        query = select(Project). \
-            filter(Project.id == id). \
-            filter(Project.owner == owner)
-        result = await session.execute(query)
 
-    return result.scalar_one_or_none()
+# What a project response contains, the search vector stays in the database
+PROJECT_COLUMNS = [column for column in Project.__table__.columns if column.key != "search_vector"]
 
 
-async def find_project_by_name(project_name: str, owner: str) -> Optional[Project]:
-    async with db_session.create_session() as session:
-        query = select(Project). \
-            filter(Project.project_name == project_name). \
-            filter(Project.owner == owner)
-        result = await session.execute(query)
+def page_query(columns, owner: str, limit: int, before_id: Optional[int], member: bool = False):
+    """ Newest first page of the owner's projects, or with member of those the owner also belongs to """
+    query = select(*columns)
+    if member:
+        # Each branch walks its own index newest first, so neither reads more than one page
+        owned = select(Project.id.label("id")).filter(Project.owner == owner)
+        joined = select(ProjectMember.project_id.label("id")).filter(ProjectMember.username == owner)
+        if before_id is not None:
+            owned = owned.filter(Project.id < before_id)
+            joined = joined.filter(ProjectMember.project_id < before_id)
+        owned = owned.order_by(Project.id.desc()).limit(limit)
+        joined = joined.order_by(ProjectMember.project_id.desc()).limit(limit)
 
-        return result.scalar_one_or_none()
+        visible = union(owned, joined).subquery()
+        query = query.filter(Project.id.in_(select(visible.c.id)))
+    else:
+        query = query.filter(Project.owner == owner)
+        if before_id is not None:
+            query = query.filter(Project.id < before_id)
 
+    return query.order_by(Project.id.desc()).limit(limit)
 
-async def create_project(project_name: str, project_summary: str, owner: str, members: Optional[list]) -> Optional[
-    Project]:
-    project_exists = await find_project_by_name(project_name, owner)
-    if project_exists:
-        raise ValidationError(f"The project {project_name} already exists", status_code=403)
 
-    # Create Project Object
-    project = Project()
-    project.project_name = project_name
-    project.project_summary = project_summary
-    project.owner = owner
+async def get_projects(session: AsyncSession, owner: str, limit: int, before_id: Optional[int] = None,
+                       member: bool = False) -> List[Row]:
+    """ One page of the owner's projects, newest first, starting below before_id when given """
+    result = await session.execute(page_query([*PROJECT_COLUMNS, members_column()], owner, limit, before_id, member))
+
+    return result.all()
+
+
+async def get_projects_versions(session: AsyncSession, owner: str, limit: int, before_id: Optional[int] = None,
+                                member: bool = False) -> List[Tuple[int, int]]:
+    """ (id, version) of the rows get_projects would return, enough to tell whether the page changed """
+    result = await session.execute(page_query([Project.id, Project.version], owner, limit, before_id, member))
+
+    return [tuple(row) for row in result]
+
+
+async def search_projects(session: AsyncSession, owner: str, terms: str, limit: int, offset: int = 0) -> List[Row]:
+    """ The owner's projects matching the search terms, best match first, through the search vector index """
+    # Same text search configuration as the generated column, otherwise the index does not apply
+    query = func.websearch_to_tsquery(literal_column("'english'::regconfig"), terms)
+    rank = func.ts_rank_cd(Project.search_vector, query).label("rank")
+
+    result = await session.execute(
+        select(*PROJECT_COLUMNS, members_column(), rank).
+        filter(Project.owner == owner).
+        filter(Project.search_vector.op("@@")(query)).
+        order_by(rank.desc(), Project.id.desc()).
+        offset(offset).
+        limit(limit)
+    )
+
+    return result.all()
+
+
+async def get_project_validators(session: AsyncSession, id: int, owner: str):
+    """ Version and updated_at of the project, without loading the rest of the row """
+    query = select(Project.version, Project.updated_at). \
+        filter(Project.id == id). \
+        filter(Project.owner == owner)
+    result = await session.execute(query)
+
+    return result.one_or_none()
+
+
+async def stream_projects(owner: str, batch_size: int = 500, replica: bool = False) -> AsyncIterator[List[dict]]:
+    """
+    Every project of the owner, oldest first, in batches read from a server-side cursor. The stream is
+    read after the endpoint returned, so it has its own session rather than the request's, on a replica
+    when there is one and replica is set.
+    """
+    async with db_session.create_routed_session(lambda: replica) as session:
+        query = select(*PROJECT_COLUMNS, members_column()). \
+            filter(Project.owner == owner). \
+            order_by(Project.id)
+        result = await session.stream(query)
+
+        async for batch in result.mappings().partitions(batch_size):
+            yield [dict(row) for row in batch]
+
+
+async def get_project_by_id(session: AsyncSession, id: int, owner: str) -> Optional[Row]:
+    query = select(*PROJECT_COLUMNS, members_column()). \
+        filter(Project.id == id). \
+        filter(Project.owner == owner)
+    result = await session.execute(query)
+
+    return result.one_or_none()
+
+
+def unique_members(members: Optional[Iterable[str]]) -> List[str]:
+    return sorted(set(members or []))
+
+
+async def replace_members(session: AsyncSession, project_id: int, members: List[str]):
+    """ Makes members the project's complete member list, leaving rows that stay untouched """
+    await session.execute(delete(ProjectMember).
+                          where(ProjectMember.project_id == project_id).
+                          where(ProjectMember.username.notin_(members)))
     if members:
-        project.members = members
-
-    # Add project to database and commit
-    async with db_session.create_session() as session:
-        session.add(project)
-        await session.commit()
-
-    await session.close()
-
-    return project
-
-
-async def update_project(id: int, owner: str, payload: ProjectModel):
-    async with db_session.create_session() as session:
-        async with session.begin():
-            query = (
-                update(Project).
-                where(Project.id == id).
-                where(Project.owner == owner).
-                values(project_name=payload.project_name, project_summary=payload.project_summary,
-                       members=payload.members).
-                returning(Project)
-            )
-            project_details = await session.execute(query)
-
-            return dict(project_details.one())
-
-
-async def delete_project(id: int, owner: str):
-    async with db_session.create_session() as session:
-        async with session.begin():
-            query = (
-                delete(Project).
-                where(Project.id == id).
-                where(Project.owner == owner)
-            )
-            await session.execute(query)
+        await session.execute(insert(ProjectMember).
+                              values([{"project_id": project_id, "username": username} for username in members]).
+                              on_conflict_do_nothing())
+
+
+async def create_project(session: AsyncSession, project_name: str, project_summary: str, owner: str,
+                         members: Optional[List[str]] = None) -> dict:
+    """ Inserts the project in one statement, the unique constraint on (owner, project_name) rejects duplicates """
+    members = unique_members(members)
+    query = (
+        insert(Project).
+        values(project_name=project_name, project_summary=project_summary, owner=owner).
+        on_conflict_do_nothing(constraint=UNIQUE_NAME_CONSTRAINT).
+        returning(*PROJECT_COLUMNS)
+    )
+    try:
+        project = (await session.execute(query)).one_or_none()
+        if project and members:
+            await replace_members(session, project.id, members)
+    except IntegrityError:
+        raise ValidationError("Every member must be an existing user.", status_code=400)
+
+    if not project:
+        raise ValidationError(f"The project {project_name} already exists", status_code=403)
+
+    after_commit(session, lambda: cache_tags.invalidate(cache_tags.user_projects_tag(owner),
+                                                        *cache_tags.members_projects_tags(members)))
+
+    return {**project, "members": members}
+
+
+async def upsert_project(session: AsyncSession, project_name: str, owner: str,
+                         payload: ProjectUpsertModel) -> Tuple[dict, bool]:
+    """ Creates the owner's project of that name or updates it, returns the row and whether it was created """
+    query = insert(Project).values(project_name=project_name, project_summary=payload.project_summary, owner=owner)
+    query = (
+        query.
+        on_conflict_do_update(constraint=UNIQUE_NAME_CONSTRAINT,
+                              set_={"project_summary": query.excluded.project_summary,
+                                    "updated_at": datetime.datetime.now(),
+                                    "version": Project.version + 1}).
+        # xmax is only set on a row version written by an UPDATE, so it tells an insert from an update
+        returning(*PROJECT_COLUMNS, members_column(), literal_column("xmax = 0").label("created"))
+    )
+    try:
+        project = dict((await session.execute(query)).one())
+        old_members = project["members"]
+        if payload.members is not None:
+            project["members"] = unique_members(payload.members)
+            await replace_members(session, project["id"], project["members"])
+    except IntegrityError:
+        raise ValidationError("Every member must be an existing user.", status_code=400)
+
+    created = project.pop("created")
+    tags = [cache_tags.project_tag(project["id"]), cache_tags.user_projects_tag(owner),
+            *cache_tags.members_projects_tags(old_members + project["members"])]
+    after_commit(session, lambda: cache_tags.invalidate(*tags))
+
+    return project, created
+
+
+async def create_projects(session: AsyncSession, projects: List[ProjectModel], owner: str) -> List[dict]:
+    """
+    Creates a batch of projects with one multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING and their
+    members with one more. Returns one result per item, in request order, with the created project or the
+    reason it was skipped.
+    """
+    results: List[Optional[dict]] = [None] * len(projects)
+
+    # Later copies of a name inside the batch lose to the first one
+    first_index = {}
+    for index, project in enumerate(projects):
+        if project.project_name in first_index:
+            results[index] = {"project_name": project.project_name, "status_code": 403,
+                              "error": f"The project {project.project_name} is repeated in this batch"}
+        else:
+            first_index[project.project_name] = index
+
+    # Items naming users that do not exist are rejected up front, with one lookup for the whole batch
+    wanted = set().union(*(unique_members(projects[index].members) for index in first_index.values()))
+    if wanted:
+        query = select(User.username).filter(User.username.in_(list(wanted)))
+        unknown = wanted - set((await session.execute(query)).scalars())
+        for project_name, index in list(first_index.items()):
+            missing = sorted(unknown.intersection(projects[index].members or []))
+            if missing:
+                results[index] = {"project_name": project_name, "status_code": 400,
+                                  "error": f"Unknown members: {', '.join(missing)}"}
+                del first_index[project_name]
+
+    created = []
+    if first_index:
+        rows = [{"project_name": project_name, "project_summary": projects[index].project_summary,
+                 "owner": owner} for project_name, index in first_index.items()]
+        query = (
+            insert(Project).
+            values(rows).
+            on_conflict_do_nothing(constraint=UNIQUE_NAME_CONSTRAINT).
+            returning(*PROJECT_COLUMNS)
+        )
+        created = [dict(project) for project in await session.execute(query)]
+
+    member_rows = []
+    # RETURNING order is not guaranteed, names are unique within the batch at this point
+    for project in created:
+        index = first_index[project["project_name"]]
+        project["members"] = unique_members(projects[index].members)
+        member_rows.extend({"project_id": project["id"], "username": username}
+                           for username in project["members"])
+        results[index] = {"project_name": project["project_name"], "status_code": 201, "project": project}
+
+    if member_rows:
+        await session.execute(insert(ProjectMember).values(member_rows))
+
+    # Rows the constraint skipped already existed
+    for project_name, index in first_index.items():
+        if results[index] is None:
+            results[index] = {"project_name": project_name, "status_code": 403,
+                              "error": f"The project {project_name} already exists"}
+
+    if created:
+        tags = [cache_tags.user_projects_tag(owner),
+                *cache_tags.members_projects_tags(row["username"] for row in member_rows)]
+        after_commit(session, lambda: cache_tags.invalidate(*tags))
+
+    return results
+
+
+async def project_exists(session: AsyncSession, id: int, owner: str) -> bool:
+    query = select(Project.id). \
+        filter(Project.id == id). \
+        filter(Project.owner == owner)
+    result = await session.execute(query)
+
+    return result.scalar_one_or_none() is not None
+
+
+async def update_project(session: AsyncSession, id: int, owner: str, payload: ProjectModel,
+                         expected_version: Optional[int] = None) -> Optional[dict]:
+    """
+    Updates the project in one statement when it exists and, if expected_version is given, is still at
+    that version. Returns the updated row or None when the project does not exist.
+    """
+    query = (
+        update(Project).
+        where(Project.id == id).
+        where(Project.owner == owner).
+        values(project_name=payload.project_name, project_summary=payload.project_summary,
+               version=Project.version + 1).
+        returning(*PROJECT_COLUMNS, members_column())
+    )
+    if expected_version is not None:
+        query = query.where(Project.version == expected_version)
+
+    try:
+        project_details = (await session.execute(query)).one_or_none()
+        if project_details:
+            project_details = dict(project_details)
+            old_members = project_details["members"]
+            if payload.members is not None:
+                project_details["members"] = unique_members(payload.members)
+                await replace_members(session, id, project_details["members"])
+    except IntegrityError as ex:
+        if UNIQUE_NAME_CONSTRAINT in str(ex):
+            # Renamed onto another project of the same owner
+            raise ValidationError(f"The project {payload.project_name} already exists", status_code=403)
+        raise ValidationError("Every member must be an existing user.", status_code=400)
+
+    if project_details:
+        tags = [cache_tags.project_tag(id), cache_tags.user_projects_tag(owner),
+                *cache_tags.members_projects_tags(old_members + project_details["members"])]
+        after_commit(session, lambda: cache_tags.invalidate(*tags))
+
+        return project_details
+
+    await check_precondition(session, id, owner, expected_version)
+
+    return None
+
+
+async def delete_project(session: AsyncSession, id: int, owner: str, expected_version: Optional[int] = None) -> bool:
+    """ Deletes the project in one statement, False when it does not exist """
+    query = (
+        delete(Project).
+        where(Project.id == id).
+        where(Project.owner == owner).
+        # The statement's snapshot still has the memberships the delete cascades to
+        returning(members_column())
+    )
+    if expected_version is not None:
+        query = query.where(Project.version == expected_version)
+
+    members = (await session.execute(query)).scalar_one_or_none()
+
+    if members is not None:
+        tags = [cache_tags.project_tag(id), cache_tags.user_projects_tag(owner),
+                *cache_tags.members_projects_tags(members)]
+        after_commit(session, lambda: cache_tags.invalidate(*tags))
+
+        return True
+
+    await check_precondition(session, id, owner, expected_version)
+
+    return False
+
+
+async def check_precondition(session: AsyncSession, id: int, owner: str, expected_version: Optional[int]):
+    """ After a conditional write matched nothing, tell a stale version (412) from a missing project """
+    if expected_version is not None and await project_exists(session, id, owner):
+        raise ValidationError("The project has been modified.", status_code=412)
+
+
+async def add_member(session: AsyncSession, id: int, owner: str, username: str) -> Optional[bool]:
+    """
+    Adds one member without touching the others. Returns None when the owner has no such project and
+    False when the user already is a member.
+    """
+    # Membership is part of the project, so the version moves with it and the update doubles as owner check
+    query = (
+        update(Project).
+        where(Project.id == id).
+        where(Project.owner == owner).
+        values(version=Project.version + 1).
+        returning(Project.id)
+    )
+    if (await session.execute(query)).scalar_one_or_none() is None:
+        return None
+
+    query = (
+        insert(ProjectMember).
+        values(project_id=id, username=username).
+        on_conflict_do_nothing().
+        returning(ProjectMember.username)
+    )
+    try:
+        added = (await session.execute(query)).scalar_one_or_none()
+    except IntegrityError:
+        raise ValidationError(f"The user {username} does not exist.", status_code=404)
+
+    if added is None:
+        # Nothing changed, the version bump must not be committed
+        set_rollback_only(session)
+        return False
+
+    after_commit(session, lambda: cache_tags.invalidate(cache_tags.project_tag(id), cache_tags.user_projects_tag(owner),
+                                                        cache_tags.user_projects_tag(username)))
+
+    return True
+
+
+async def remove_member(session: AsyncSession, id: int, owner: str, username: str) -> Optional[bool]:
+    """ Removes one member. Returns None when the owner has no such project and False when it is no member """
+    query = (
+        update(Project).
+        where(Project.id == id).
+        where(Project.owner == owner).
+        values(version=Project.version + 1).
+        returning(Project.id)
+    )
+    if (await session.execute(query)).scalar_one_or_none() is None:
+        return None
+
+    query = (
+        delete(ProjectMember).
+        where(ProjectMember.project_id == id).
+        where(ProjectMember.username == username).
+        returning(ProjectMember.username)
+    )
+    if (await session.execute(query)).scalar_one_or_none() is None:
+        set_rollback_only(session)
+        return False
+
+    after_commit(session, lambda: cache_tags.invalidate(cache_tags.project_tag(id), cache_tags.user_projects_tag(owner),
+                                                        cache_tags.user_projects_tag(username)))
+
+    return True
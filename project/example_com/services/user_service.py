@@ -1,134 +1,191 @@
 # Imports
+import asyncio
 import datetime
-from passlib.handlers.sha2_crypt import sha512_crypt as crypto
+import logging
 from sqlalchemy import update, delete
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from sqlalchemy.future import select
-from typing import Optional
+from typing import Optional, Set
 # Custom Libraries
 from example_com.data import db_session
 from example_com.data.account.users import User
+from example_com.infrastructure import cache_tags
+from example_com.infrastructure import hashing
+from example_com.infrastructure import principal_cache
+from example_com.infrastructure.unit_of_work import after_commit
 from example_com.models.user_schema import BaseUserSchema
 from example_com.models.validation import ValidationError
 
+log = logging.getLogger("uvicorn")
 
-async def find_user_by_email(email: str) -> Optional[User]:
-    async with db_session.create_session() as session:
-        query = select(User).filter(User.email == email)
-        result = await session.execute(query)
+# Keeps references to in-flight background re-hashes so they are not garbage collected
+__rehash_tasks: Set[asyncio.Task] = set()
 
-        return result.scalar_one_or_none()
 
+async def find_user_by_email(session: AsyncSession, email: str) -> Optional[User]:
+    query = select(User).filter(User.email == email)
+    result = await session.execute(query)
 
-async def find_user_by_username(username: str) -> Optional[User]:
-    async with db_session.create_session() as session:
-        query = select(User).filter(User.username == username)
-        result = await session.execute(query)
+    return result.scalar_one_or_none()
 
-        return result.scalar_one_or_none()
 
+async def find_user_by_username(session: AsyncSession, username: str) -> Optional[User]:
+    query = select(User).filter(User.username == username)
+    result = await session.execute(query)
 
-async def find_user_by_id(uid: int) -> Optional[User]:
-    async with db_session.create_session() as session:
-        query = select(User).filter(User.id == uid)
-        result = await session.execute(query)
+    return result.scalar_one_or_none()
 
-        return result.scalar_one_or_none()
 
+async def find_user_by_id(session: AsyncSession, uid: int) -> Optional[User]:
+    query = select(User).filter(User.id == uid)
+    result = await session.execute(query)
 
-async def create_user(first_name: str, last_name: str, username: str, email: str, password: str) -> Optional[User]:
+    return result.scalar_one_or_none()
+
+
+async def create_user(session: AsyncSession, first_name: str, last_name: str, username: str, email: str,
+                      password: str) -> Optional[User]:
     # Create User Object
     user = User()
     user.first_name = first_name
     user.last_name = last_name
     user.username = username
     user.email = email
-    user.hashed_password = crypto.using(rounds=184_597).hash(password)
 
-    # Add user to database and commit
-    async with db_session.create_session() as session:
-        session.add(user)
-        await session.commit()
+    # Hand the connection of the duplicate checks back to the pool while the password is hashed
+    await session.commit()
+    user.hashed_password = await hashing.hash_password(password)
 
-    await session.close()
+    # Flushed for its id, the request's unit of work commits it
+    session.add(user)
+    await session.flush()
 
     return user
 
 
-async def confirm_user(email: str) -> Optional[User]:
-    async with db_session.create_session() as session:
-        query = select(User).filter(User.email == email)
-        user = await session.execute(query)
-        if not user:
-            return None
+async def confirm_user(session: AsyncSession, email: str) -> Optional[User]:
+    query = select(User).filter(User.email == email)
+    user = (await session.execute(query)).scalar_one_or_none()
+    if not user:
+        return None
 
-        user.confirmed = True
-        user.confirmed_on = datetime.datetime.now()
-        await session.commit()
+    user.confirmed = True
+    user.confirmed_on = datetime.datetime.now()
 
     return user
 
 
-async def login_user(username: str, password: str) -> Optional[User]:
-    async with db_session.create_session() as session:
-        query = select(User).filter(User.username == username)
-        results = await session.execute(query)
-
-        user = results.scalar_one_or_none()
-        if not user:
-            return None
+async def login_user(session: AsyncSession, username: str, password: str) -> Optional[User]:
+    """
+    Authenticate with a single lookup of the columns needed to verify the password and record the
+    login. The returned principal only has id, username, hashed_password and last_login loaded.
+    """
+    query = (
+        select(User).
+        options(load_only(User.id, User.username, User.hashed_password)).
+        filter(User.username == username)
+    )
+    results = await session.execute(query)
 
-        try:
-            if not crypto.verify(password, user.hashed_password):
-                return None
-        except ValueError:
-            return None
+    user = results.scalar_one_or_none()
+    if not user:
+        return None
 
-        return user
+    # Hand the connection back to the pool while the password is verified
+    await session.commit()
 
+    if not await hashing.verify_password(password, user.hashed_password):
+        return None
 
-async def update_user(username: str, payload: BaseUserSchema):
-    async with db_session.create_session() as session:
-        async with session.begin():
-            query = (
-                update(User).
-                where(User.username == username).
-                values(first_name=payload.first_name, last_name=payload.last_name).
-                returning(User)
-            )
-            user_details = await session.execute(query)
+    user.last_login = datetime.datetime.now()
+    # last_login and updated_at change, the cached principal has to go with the responses built from it
+    after_commit(session, lambda: invalidate_user(username, cache_tags.user_tag(username)))
 
-            return dict(user_details.one())
+    if hashing.needs_update(user.hashed_password):
+        task = asyncio.create_task(rehash_password(username, password, user.hashed_password))
+        __rehash_tasks.add(task)
+        task.add_done_callback(__rehash_tasks.discard)
 
+    return user
 
-async def change_password(username: str, old_pass: str, new_pass: str):
-    async with db_session.create_session() as session:
-        async with session.begin():
-            query = select(User).filter(User.username == username)
-            results = await session.execute(query)
 
-            user = results.scalar_one_or_none()
+async def rehash_password(username: str, password: str, old_hashed_password: str):
+    """ Upgrade an outdated hash, unless the password was changed in the meantime. Outlives the request. """
+    try:
+        new_hashed_password = await hashing.hash_password(password)
 
-            # Change password
-            if not crypto.verify(old_pass, user.hashed_password):
-                raise ValidationError(error_msg="Password is incorrect.", status_code=400)
-            else:
-                new_hashed_password = crypto.using(rounds=184_597).hash(new_pass)
+        async with db_session.create_session() as session:
+            async with session.begin():
                 query = (
                     update(User).
                     where(User.username == username).
-                    values(hashed_password=new_hashed_password).
-                    returning(User)
+                    where(User.hashed_password == old_hashed_password).
+                    values(hashed_password=new_hashed_password)
                 )
-                user_details = await session.execute(query)
+                await session.execute(query)
+
+        await invalidate_user(username, cache_tags.user_tag(username))
+
+    except Exception as ex:
+        log.warning(f"Could not re-hash the password of {username}: {ex}")
+
+
+async def invalidate_user(username: str, *tags: str):
+    """ Drop the cached principal and the responses under its tags, after the change committed """
+    await principal_cache.invalidate(username)
+    await cache_tags.invalidate(*tags)
+
+
+async def update_user(session: AsyncSession, username: str, payload: BaseUserSchema) -> Row:
+    query = (
+        update(User).
+        where(User.username == username).
+        values(first_name=payload.first_name, last_name=payload.last_name).
+        returning(User)
+    )
+    user_details = await session.execute(query)
+    updated_user = user_details.one()
+
+    after_commit(session, lambda: invalidate_user(username, cache_tags.user_tag(username)))
+
+    return updated_user
+
+
+async def change_password(session: AsyncSession, username: str, old_pass: str, new_pass: str) -> Row:
+    query = select(User).filter(User.username == username)
+    results = await session.execute(query)
+
+    user = results.scalar_one_or_none()
+
+    # Hash outside of the transaction so no connection is held while the pool works
+    await session.commit()
+    if not await hashing.verify_password(old_pass, user.hashed_password):
+        raise ValidationError(error_msg="Password is incorrect.", status_code=400)
+
+    new_hashed_password = await hashing.hash_password(new_pass)
+
+    query = (
+        update(User).
+        where(User.username == username).
+        values(hashed_password=new_hashed_password).
+        returning(User)
+    )
+    user_details = await session.execute(query)
+    updated_user = user_details.one()
+
+    after_commit(session, lambda: invalidate_user(username, cache_tags.user_tag(username)))
+
+    return updated_user
 
-                return dict(user_details.one())
 
+async def delete_account(session: AsyncSession, username: str):
+    query = (
+        delete(User).
+        where(User.username == username)
+    )
+    await session.execute(query)
 
-async def delete_account(username: str):
-    async with db_session.create_session() as session:
-        async with session.begin():
-            query = (
-                delete(User).
-                where(User.username == username)
-            )
-            await session.execute(query)
+    after_commit(session, lambda: invalidate_user(username, cache_tags.user_tag(username),
+                                                  cache_tags.user_projects_tag(username)))
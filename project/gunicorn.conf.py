@@ -0,0 +1,32 @@
+#!/usr/bin/python3
+###############################################################################
+# Script      : gunicorn.conf.py
+# Description : Gunicorn settings, prepares Prometheus metrics shared by the workers
+###############################################################################
+
+# Imports
+import os
+import shutil
+import tempfile
+
+# Workers write their metrics to files here. prometheus_client picks its storage when it is first imported,
+# so this has to be set before anything imports it, in the master and in every worker forked from it.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus-metrics"))
+
+bind = "0.0.0.0:5000"
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def on_starting(server):
+    # Files left by a previous run would be counted again
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    # Imported here, once PROMETHEUS_MULTIPROC_DIR is set
+    from prometheus_client import multiprocess
+
+    # Drops the live gauges of the worker, its counters and histograms keep counting
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,15 +1,20 @@
 # Imports
-import aioredis
 import asyncio
 import os
 import pytest
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
+from sqlalchemy import event
 from starlette.testclient import TestClient
+
+# Hash test passwords at the cheapest cost, this has to be set before the settings are loaded
+os.environ.setdefault("PASSWORD_ROUNDS", "1000")
+# An outdated scheme that still verifies, logging in with one of its hashes re-hashes the password
+os.environ.setdefault("PASSWORD_SCHEMES", "sha512_crypt,pbkdf2_sha256")
+
 # Custom Imports
 from example_com.app import create_app
-from example_com.config import Settings, get_settings, tome_key_builder
+from example_com.config import Settings, get_settings
 from example_com.data import db_session
+from example_com.data.migrate import run_migrations
 
 
 def get_settings_override():
@@ -32,15 +37,45 @@ def test_app():
 @pytest.fixture(scope="module")
 def test_app_with_db():
     # Setup
+    asyncio.run(run_migrations(os.environ.get("DATABASE_URL")))
     app = create_app()
     app.dependency_overrides[get_settings] = get_settings_override
-    redis = aioredis.from_url(url="redis://localhost", encoding="utf-8", decode_responses=True)
-    FastAPICache.init(RedisBackend(redis), key_builder=tome_key_builder, prefix="example")
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(db_session.global_init())
+    # The startup hook initializes the database and the shared redis pool
     with TestClient(app) as test_client:
 
         # Testing
         yield test_client
 
     # Tear Down
+
+
+@pytest.fixture
+def query_counter():
+    # Collects every SQL statement sent to the database while the test runs
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_engine().sync_engine
+    event.listen(engine, "before_cursor_execute", count_statement)
+
+    yield statements
+
+    event.remove(engine, "before_cursor_execute", count_statement)
+
+
+@pytest.fixture
+def checkout_counter():
+    # Counts the connections checked out of the pool while the test runs
+    checkouts = []
+
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.append(connection_record)
+
+    engine = db_session.get_engine().sync_engine
+    event.listen(engine, "checkout", count_checkout)
+
+    yield checkouts
+
+    event.remove(engine, "checkout", count_checkout)
@@ -1,8 +1,21 @@
 # Imports
 import json
+from sqlalchemy import update
 # Custom Imports
+from example_com.data import db_session
+from example_com.data.account.users import User
+from example_com.infrastructure import principal_cache
+from example_com.infrastructure.cache_tags import user_tag
 from example_com.infrastructure.jwt_token_auth import set_token
 from example_com.models.validation import ValidationError
+from example_com.services import user_service
+
+
+async def set_admin(username: str, is_admin: bool):
+    async with db_session.create_session() as session:
+        async with session.begin():
+            await session.execute(update(User).filter(User.username == username).values(is_admin=is_admin))
+    await user_service.invalidate_user(username, user_tag(username))
 
 
 ###############################################################################
@@ -52,6 +65,44 @@ def test_account_authentication_token(test_app_with_db):
     response = test_app_with_db.get("/api/account", headers=headers)
 
     assert response.status_code == 200
+    assert response.json()["username"] == "pytest"
+    assert "hashed_password" not in response.json()
+
+    # Served from the response cache, through the same response model
+    cached = test_app_with_db.get("/api/account", headers=headers)
+
+    assert cached.json() == response.json()
+
+
+def test_account_principal_cache_hit(test_app_with_db):
+    token = set_token("pytest")
+    headers = {
+        "Authorization": f"Bearer {token}"
+    }
+    hits = principal_cache.stats()["hits"]
+    response = test_app_with_db.get("/api/account", headers=headers)
+
+    assert response.status_code == 200
+    assert principal_cache.stats()["hits"] == hits + 1
+
+
+def test_account_not_modified(test_app_with_db):
+    token = set_token("pytest")
+    headers = {
+        "Authorization": f"Bearer {token}"
+    }
+    response = test_app_with_db.get("/api/account", headers=headers)
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    response = test_app_with_db.get("/api/account", headers={**headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = test_app_with_db.get("/api/account", headers={**headers, "If-Modified-Since": last_modified})
+
+    assert response.status_code == 304
 
 
 ###############################################################################
@@ -79,6 +130,18 @@ def test_account_correct_user(test_app_with_db):
     assert response.json()["token_type"] == "Bearer"
 
 
+def test_account_login_query_count(test_app_with_db, query_counter):
+    creds = {
+        "username": "pytest",
+        "password": "fixtuREz2p@ss"
+    }
+    response = test_app_with_db.post("/api/token", data=creds)
+
+    assert response.status_code == 200
+    # One SELECT to verify the password, one UPDATE of last_login
+    assert len(query_counter) == 2
+
+
 # Test Account Creation Restraints
 def test_first_name_restraint(test_app_with_db):
     new_user = {
@@ -157,6 +220,11 @@ def test_account_update_info(test_app_with_db):
 
     assert response.status_code == 200
 
+    response = test_app_with_db.get("/api/account", headers=headers)
+
+    assert response.json()["first_name"] == "ChangePytester"
+    assert response.json()["updated_at"] > response.json()["created_at"]
+
 
 def test_account_update_password(test_app_with_db):
     token = set_token("pytest")
@@ -190,10 +258,46 @@ def test_account_updated_password(test_app_with_db):
     assert response.json()["token_type"] == "Bearer"
 
 
+def test_account_login_refreshes_account(test_app_with_db):
+    headers = {
+        "Authorization": f"Bearer {set_token('pytest')}"
+    }
+    # Cached along with the principal it is built from
+    before = test_app_with_db.get("/api/account", headers=headers)
+    creds = {
+        "username": "pytest",
+        "password": "icantTH!NKof1g00d1"
+    }
+
+    assert test_app_with_db.post("/api/token", data=creds).status_code == 200
+
+    after = test_app_with_db.get("/api/account", headers=headers)
+
+    assert after.json()["last_login"] > before.json()["last_login"]
+    assert after.headers["ETag"] != before.headers["ETag"]
+
+
+###############################################################################
+# Test Admin Requests
+###############################################################################
+def test_account_admin_revoked(test_app_with_db):
+    headers = {
+        "Authorization": f"Bearer {set_token('pytest')}"
+    }
+    test_app_with_db.portal.call(set_admin, "pytest", True)
+
+    assert test_app_with_db.get("/api/admin/settings", headers=headers).status_code == 200
+
+    # The cached settings go with the admin rights
+    test_app_with_db.portal.call(set_admin, "pytest", False)
+
+    assert test_app_with_db.get("/api/admin/settings", headers=headers).status_code == 401
+
+
 ###############################################################################
 # Test DELETE Requests
 ###############################################################################
-def test_account_deletion(test_app_with_db):
+def test_account_deletion(test_app_with_db, checkout_counter):
     token = set_token("pytest")
     headers = {
         "accept": "application/json",
@@ -202,3 +306,5 @@ def test_account_deletion(test_app_with_db):
     response = test_app_with_db.delete("/api/account/pytest", headers=headers)
 
     assert response.status_code == 204
+    # Lookup and delete run in the request's one session
+    assert len(checkout_counter) == 1
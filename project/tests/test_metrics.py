@@ -0,0 +1,66 @@
+# Imports
+import uuid
+from prometheus_client import REGISTRY
+from starlette.requests import Request
+# Custom Imports
+from example_com.infrastructure.cache import cache
+
+
+@cache(expire=60, namespace="pytest-metrics")
+async def cached_endpoint(request: Request):
+    return {"cached": True}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+###############################################################################
+# Test Metrics
+###############################################################################
+def test_metrics_count_requests_by_route_template(test_app_with_db):
+    labels = {"method": "GET", "route": "/api/workspaces/projects/{id}", "status": "401"}
+    before = sample("http_requests_total", **labels)
+
+    test_app_with_db.get("/api/workspaces/projects/1")
+    test_app_with_db.get("/api/workspaces/projects/2")
+    test_app_with_db.get(f"/pytest/{uuid.uuid4().hex}")
+
+    assert sample("http_requests_total", **labels) == before + 2
+    assert sample("http_requests_total", method="GET", route="unmatched", status="404") >= 1
+    assert sample("http_request_duration_seconds_count", method="GET",
+                  route="/api/workspaces/projects/{id}") >= 2
+
+
+def test_metrics_time_database_and_redis(test_app_with_db):
+    statements = sample("db_statement_duration_seconds_count", operation="SELECT")
+    pings = sample("redis_command_duration_seconds_count", command="ping")
+
+    assert test_app_with_db.get("/health/ready").status_code == 200
+
+    assert sample("db_statement_duration_seconds_count", operation="SELECT") > statements
+    assert sample("redis_command_duration_seconds_count", command="ping") == pings + 1
+    assert sample("db_pool_checkout_wait_seconds_count", engine="primary") > 0
+    assert REGISTRY.get_sample_value("db_pool_checked_out", {"engine": "primary"}) is not None
+
+
+def test_metrics_count_cache_lookups(test_app_with_db):
+    test_app_with_db.app.add_api_route("/pytest/metrics-cached", cached_endpoint)
+    url = f"/pytest/metrics-cached?run={uuid.uuid4().hex}"
+    misses = sample("response_cache_lookups_total", namespace="pytest-metrics", result="miss")
+    hits = sample("response_cache_lookups_total", namespace="pytest-metrics", result="hit")
+
+    test_app_with_db.get(url)
+    test_app_with_db.get(url)
+
+    assert sample("response_cache_lookups_total", namespace="pytest-metrics", result="miss") == misses + 1
+    assert sample("response_cache_lookups_total", namespace="pytest-metrics", result="hit") == hits + 1
+
+
+def test_metrics_endpoint(test_app_with_db):
+    response = test_app_with_db.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_requests_total" in response.text
+    assert "redis_command_duration_seconds_bucket" in response.text
@@ -0,0 +1,50 @@
+# Imports
+import asyncio
+import os
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+# Custom Imports
+from example_com.data.migrations import m0003_projects_owner_name_unique
+
+
+async def rename_duplicates(rows):
+    """ Run m0003 against a temporary projects table holding rows, returns the names it leaves """
+    engine = create_async_engine(os.environ.get("DATABASE_URL"))
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            # Shadows the real table for this transaction only
+            await conn.execute(text("CREATE TEMP TABLE projects (id INTEGER PRIMARY KEY, owner TEXT, project_name TEXT) "
+                                    "ON COMMIT DROP"))
+            for row in rows:
+                await conn.execute(text("INSERT INTO projects VALUES (:id, :owner, :project_name)"), row)
+            for statement in m0003_projects_owner_name_unique.STATEMENTS:
+                await conn.execute(text(statement))
+            result = await conn.execute(text("SELECT id, project_name FROM projects ORDER BY id"))
+            names = dict(result.all())
+            await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+    return names
+
+
+###############################################################################
+# Test Migrations
+###############################################################################
+def test_unique_names_migration_skips_taken_names():
+    rows = [
+        {"id": 1, "owner": "pytest", "project_name": "Project"},
+        {"id": 2, "owner": "pytest", "project_name": "Project (3)"},
+        {"id": 3, "owner": "pytest", "project_name": "Project"},
+        {"id": 4, "owner": "pytest", "project_name": "Project"},
+        {"id": 5, "owner": "other", "project_name": "Project"},
+    ]
+
+    assert asyncio.run(rename_duplicates(rows)) == {
+        1: "Project",
+        2: "Project (3)",
+        3: "Project (3-2)",
+        4: "Project (4)",
+        5: "Project",
+    }
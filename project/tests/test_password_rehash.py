@@ -0,0 +1,88 @@
+# Imports
+import json
+import time
+from passlib.handlers.pbkdf2 import pbkdf2_sha256
+from sqlalchemy import delete, select, update
+# Custom Imports
+from example_com.data import db_session
+from example_com.data.account.users import User
+from example_com.infrastructure.jwt_token_auth import set_token
+from example_com.services import user_service
+
+USERNAME = "pytest-rehash"
+PASSWORD = "fixtuREz2p@ss"
+
+
+async def get_hashed_password() -> str:
+    async with db_session.create_session() as session:
+        return (await session.execute(select(User.hashed_password).filter(User.username == USERNAME))).scalar_one()
+
+
+async def set_hashed_password(hashed_password: str):
+    async with db_session.create_session() as session:
+        async with session.begin():
+            await session.execute(update(User).filter(User.username == USERNAME).values(hashed_password=hashed_password))
+
+
+async def delete_user():
+    async with db_session.create_session() as session:
+        async with session.begin():
+            await session.execute(delete(User).filter(User.username == USERNAME))
+
+
+def login(test_app, password: str):
+    return test_app.post("/api/token", data={"username": USERNAME, "password": password})
+
+
+###############################################################################
+# Test Password Re-hashing
+###############################################################################
+def test_rehash_register(test_app_with_db):
+    test_app_with_db.portal.call(delete_user)
+    new_user = {
+        "first_name": "Pytester",
+        "last_name": "McPythonson",
+        "username": USERNAME,
+        "email": "pytest-rehash@example.com",
+        "password": PASSWORD
+    }
+    response = test_app_with_db.post("/api/account/register", data=json.dumps(new_user))
+
+    assert response.status_code == 201
+
+
+def test_rehash_outdated_scheme_on_login(test_app_with_db):
+    test_app_with_db.portal.call(set_hashed_password, pbkdf2_sha256.hash(PASSWORD, rounds=1000))
+
+    assert login(test_app_with_db, PASSWORD).status_code == 200
+
+    # The login answers first, the new hash is written in the background
+    deadline = time.monotonic() + 5
+    hashed_password = test_app_with_db.portal.call(get_hashed_password)
+    while hashed_password.startswith("$pbkdf2-sha256$") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        hashed_password = test_app_with_db.portal.call(get_hashed_password)
+
+    assert hashed_password.startswith("$6$")
+    assert login(test_app_with_db, PASSWORD).status_code == 200
+
+
+def test_rehash_keeps_a_password_changed_meanwhile(test_app_with_db):
+    outdated = pbkdf2_sha256.hash(PASSWORD, rounds=1000)
+    test_app_with_db.portal.call(set_hashed_password, outdated)
+    new_password = "icantTH!NKof1g00d1"
+    headers = {"Authorization": f"Bearer {set_token(USERNAME)}"}
+    response = test_app_with_db.put(f"/api/account/{USERNAME}/security", headers=headers,
+                                    data=json.dumps({"old_password": PASSWORD, "new_password": new_password}))
+
+    assert response.status_code == 200
+
+    changed = test_app_with_db.portal.call(get_hashed_password)
+    # A re-hash of the old password that started before the change finishes after it
+    test_app_with_db.portal.call(user_service.rehash_password, USERNAME, PASSWORD, outdated)
+
+    assert test_app_with_db.portal.call(get_hashed_password) == changed
+    assert login(test_app_with_db, PASSWORD).status_code == 400
+    assert login(test_app_with_db, new_password).status_code == 200
+
+    test_app_with_db.portal.call(delete_user)
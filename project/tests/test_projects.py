@@ -0,0 +1,371 @@
+# Imports
+import json
+# Custom Imports
+from example_com.infrastructure import principal_cache
+from example_com.infrastructure.jwt_token_auth import set_token
+
+
+def auth_headers(username: str = "projtest"):
+    token = set_token(username)
+    return {
+        "Authorization": f"Bearer {token}"
+    }
+
+
+###############################################################################
+# Create Test Account and Projects
+###############################################################################
+def test_projects_account_registration(test_app_with_db):
+    new_user = {
+        "first_name": "Project",
+        "last_name": "Tester",
+        "username": "projtest",
+        "email": "projtest@example.com",
+        "password": "pr0jectP@ssword"
+    }
+    response = test_app_with_db.post("/api/account/register", data=json.dumps(new_user))
+
+    assert response.status_code == 201
+
+    new_user = {**new_user, "username": "projmember", "email": "projmember@example.com"}
+    response = test_app_with_db.post("/api/account/register", data=json.dumps(new_user))
+
+    assert response.status_code == 201
+
+
+def test_projects_empty_listing(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects", headers=auth_headers())
+
+    assert response.status_code == 404
+
+
+def test_project_creation(test_app_with_db):
+    for i in range(3):
+        new_project = {
+            "project_name": f"Project {i}",
+            "project_summary": f"Summary of project {i}"
+        }
+        response = test_app_with_db.post("/api/workspaces/projects/new", data=json.dumps(new_project),
+                                         headers=auth_headers())
+
+        assert response.status_code == 201
+
+
+def test_project_creation_duplicate(test_app_with_db, query_counter):
+    new_project = {
+        "project_name": "Project 0",
+        "project_summary": "Same name as an existing project"
+    }
+    response = test_app_with_db.post("/api/workspaces/projects/new", data=json.dumps(new_project),
+                                     headers=auth_headers())
+
+    assert response.status_code == 403
+    assert response.content.decode("utf-8") == "The project Project 0 already exists"
+    # A single INSERT ... ON CONFLICT, plus the principal lookup
+    assert len(query_counter) <= 2
+
+
+###############################################################################
+# Test GET Requests
+###############################################################################
+def test_projects_keyset_pagination(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects?limit=2", headers=auth_headers())
+
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [p["project_name"] for p in first_page["projects"]] == ["Project 2", "Project 1"]
+    assert first_page["next_cursor"]
+
+    response = test_app_with_db.get(f"/api/workspaces/projects?limit=2&cursor={first_page['next_cursor']}",
+                                    headers=auth_headers())
+
+    assert response.status_code == 200
+    second_page = response.json()
+    assert [p["project_name"] for p in second_page["projects"]] == ["Project 0"]
+    assert second_page["next_cursor"] is None
+
+
+def test_projects_not_modified(test_app_with_db, query_counter):
+    response = test_app_with_db.get("/api/workspaces/projects?limit=2", headers=auth_headers())
+    etag = response.headers["ETag"]
+    project = response.json()["projects"][0]
+
+    query_counter.clear()
+    response = test_app_with_db.get("/api/workspaces/projects?limit=2",
+                                    headers={**auth_headers(), "If-None-Match": etag})
+
+    assert response.status_code == 304
+    # Only the (id, version) page query, plus the principal lookup
+    assert len(query_counter) <= 2
+
+    response = test_app_with_db.get("/api/workspaces/projects?limit=1",
+                                    headers={**auth_headers(), "If-None-Match": etag})
+
+    assert response.status_code == 200
+
+    response = test_app_with_db.get(f"/api/workspaces/projects/{project['id']}", headers=auth_headers())
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    response = test_app_with_db.get(f"/api/workspaces/projects/{project['id']}",
+                                    headers={**auth_headers(), "If-None-Match": etag})
+
+    assert response.status_code == 304
+
+    response = test_app_with_db.get(f"/api/workspaces/projects/{project['id']}",
+                                    headers={**auth_headers(), "If-Modified-Since": last_modified})
+
+    assert response.status_code == 304
+
+
+def test_projects_search(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects/search?q=summary 1", headers=auth_headers())
+
+    assert response.status_code == 200
+    assert [p["project_name"] for p in response.json()["projects"]] == ["Project 1"]
+
+    response = test_app_with_db.get("/api/workspaces/projects/search?q=summaries&limit=2", headers=auth_headers())
+
+    assert [p["project_name"] for p in response.json()["projects"]] == ["Project 2", "Project 1"]
+    assert response.json()["next_offset"] == 2
+
+
+def test_projects_export(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects/export", headers=auth_headers())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    projects = [json.loads(line) for line in response.text.splitlines()]
+    assert [p["project_name"] for p in projects] == ["Project 0", "Project 1", "Project 2"]
+
+
+def test_projects_export_invalid_token(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects/export", headers={"Authorization": "Bearer madeuptoken"})
+
+    assert response.status_code == 401
+    assert response.content.decode("utf-8") == "Invalid token"
+
+
+def test_projects_invalid_cursor(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects?cursor=notacursor", headers=auth_headers())
+
+    assert response.status_code == 400
+    assert response.content.decode("utf-8") == "Invalid cursor."
+
+
+###############################################################################
+# Test Bulk Create
+###############################################################################
+def test_projects_bulk_creation(test_app_with_db, query_counter):
+    new_projects = [
+        {"project_name": "Project 3", "project_summary": "Summary of project 3"},
+        {"project_name": "Project 3", "project_summary": "Repeated in the batch"},
+        {"project_name": "Project 0", "project_summary": "Already exists"},
+        {"project_name": "Project 4", "project_summary": "Summary of project 4", "members": ["projmember"]},
+        {"project_name": "Project 7", "project_summary": "Unknown member", "members": ["nosuchuser"]}
+    ]
+    response = test_app_with_db.post("/api/workspaces/projects/bulk", data=json.dumps(new_projects),
+                                     headers=auth_headers())
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+    assert [r["status_code"] for r in response.json()["results"]] == [201, 403, 403, 201, 400]
+    assert response.json()["results"][3]["project"]["members"] == ["projmember"]
+    # Member lookup, project insert and member insert, plus the principal lookup
+    assert len(query_counter) <= 4
+
+
+def test_projects_bulk_creation_empty(test_app_with_db):
+    response = test_app_with_db.post("/api/workspaces/projects/bulk", data=json.dumps([]), headers=auth_headers())
+
+    assert response.status_code == 422
+
+
+###############################################################################
+# Test PUT Requests
+###############################################################################
+def test_project_upsert_by_name(test_app_with_db):
+    payload = {"project_summary": "Created by name"}
+    response = test_app_with_db.put("/api/workspaces/projects/by-name/Project 5", data=json.dumps(payload),
+                                    headers=auth_headers())
+
+    assert response.status_code == 201
+    assert response.json()["project_summary"] == "Created by name"
+
+    payload = {"project_summary": "Updated by name"}
+    response = test_app_with_db.put("/api/workspaces/projects/by-name/Project 5", data=json.dumps(payload),
+                                    headers=auth_headers())
+
+    assert response.status_code == 200
+    assert response.json()["project_summary"] == "Updated by name"
+
+
+def test_project_cache_invalidation(test_app_with_db, query_counter):
+    response = test_app_with_db.get("/api/workspaces/projects?limit=200", headers=auth_headers())
+    project_id = next(p["id"] for p in response.json()["projects"] if p["project_name"] == "Project 5")
+    test_app_with_db.get(f"/api/workspaces/projects/{project_id}", headers=auth_headers())
+
+    query_counter.clear()
+    response = test_app_with_db.get(f"/api/workspaces/projects/{project_id}", headers=auth_headers())
+
+    # Served from the response cache, validators included
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+    assert len(query_counter) == 0
+
+    payload = {"project_summary": "Updated again by name"}
+    test_app_with_db.put("/api/workspaces/projects/by-name/Project 5", data=json.dumps(payload),
+                         headers=auth_headers())
+    response = test_app_with_db.get(f"/api/workspaces/projects/{project_id}", headers=auth_headers())
+
+    assert response.json()["project_summary"] == "Updated again by name"
+    assert response.headers["ETag"] == '"3"'
+
+
+def test_project_rename_conflict(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects?limit=200", headers=auth_headers())
+    project = next(p for p in response.json()["projects"] if p["project_name"] == "Project 5")
+    payload = {"project_name": "Project 0", "project_summary": "Renamed onto an existing project"}
+    response = test_app_with_db.put(f"/api/workspaces/projects/{project['id']}", data=json.dumps(payload),
+                                    headers=auth_headers())
+
+    assert response.status_code == 403
+
+
+def test_project_update_if_match(test_app_with_db, query_counter):
+    response = test_app_with_db.get("/api/workspaces/projects?limit=200", headers=auth_headers())
+    project_id = next(p["id"] for p in response.json()["projects"] if p["project_name"] == "Project 5")
+    response = test_app_with_db.get(f"/api/workspaces/projects/{project_id}", headers=auth_headers())
+    etag = response.headers["ETag"]
+
+    assert etag == '"3"'
+
+    payload = {"project_name": "Project 5", "project_summary": "Edited with the current version"}
+    query_counter.clear()
+    response = test_app_with_db.put(f"/api/workspaces/projects/{project_id}", data=json.dumps(payload),
+                                    headers={**auth_headers(), "If-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"4"'
+    assert response.json()["updated_at"] > response.json()["created_at"]
+    # One conditional UPDATE ... RETURNING, plus the principal lookup
+    assert len(query_counter) <= 2
+
+    payload = {"project_name": "Project 5", "project_summary": "Edited with a stale version"}
+    response = test_app_with_db.put(f"/api/workspaces/projects/{project_id}", data=json.dumps(payload),
+                                    headers={**auth_headers(), "If-Match": etag})
+
+    assert response.status_code == 412
+
+    response = test_app_with_db.delete(f"/api/workspaces/projects/{project_id}",
+                                       headers={**auth_headers(), "If-Match": etag})
+
+    assert response.status_code == 412
+
+
+def test_project_update_missing(test_app_with_db):
+    payload = {"project_name": "Missing", "project_summary": "Does not exist"}
+    response = test_app_with_db.put("/api/workspaces/projects/999999", data=json.dumps(payload),
+                                    headers={**auth_headers(), "If-Match": '"1"'})
+
+    assert response.status_code == 404
+
+
+def test_project_update_single_checkout(test_app_with_db, query_counter, checkout_counter):
+    response = test_app_with_db.get("/api/workspaces/projects?limit=200", headers=auth_headers())
+    project_id = next(p["id"] for p in response.json()["projects"] if p["project_name"] == "Project 5")
+    principal_cache.evict("projtest")
+
+    payload = {"project_name": "Project 5", "project_summary": "Edited in one unit of work"}
+    query_counter.clear()
+    checkout_counter.clear()
+    response = test_app_with_db.put(f"/api/workspaces/projects/{project_id}", data=json.dumps(payload),
+                                    headers=auth_headers())
+
+    assert response.status_code == 200
+    # The principal lookup and the UPDATE ... RETURNING share the request's session and connection
+    assert len(query_counter) == 2
+    assert len(checkout_counter) == 1
+
+
+###############################################################################
+# Test Project Members
+###############################################################################
+def test_project_members(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects?limit=200", headers=auth_headers())
+    projects = {p["project_name"]: p["id"] for p in response.json()["projects"]}
+    project_id = projects["Project 1"]
+
+    response = test_app_with_db.post(f"/api/workspaces/projects/{project_id}/members",
+                                     data=json.dumps({"username": "projmember"}), headers=auth_headers())
+
+    assert response.status_code == 201
+
+    etag = test_app_with_db.get(f"/api/workspaces/projects/{project_id}", headers=auth_headers()).headers["ETag"]
+    response = test_app_with_db.post(f"/api/workspaces/projects/{project_id}/members",
+                                     data=json.dumps({"username": "projmember"}), headers=auth_headers())
+
+    assert response.status_code == 200
+
+    # Already a member, the version bump was rolled back
+    response = test_app_with_db.get(f"/api/workspaces/projects/{project_id}",
+                                    headers={**auth_headers(), "Cache-Control": "no-store"})
+
+    assert response.headers["ETag"] == etag
+
+    response = test_app_with_db.post(f"/api/workspaces/projects/{project_id}/members",
+                                     data=json.dumps({"username": "nosuchuser"}), headers=auth_headers())
+
+    assert response.status_code == 404
+
+    response = test_app_with_db.get(f"/api/workspaces/projects/{project_id}", headers=auth_headers())
+
+    assert response.json()["members"] == ["projmember"]
+
+    response = test_app_with_db.get("/api/workspaces/projects?member=me", headers=auth_headers("projmember"))
+
+    # Project 4 got the member in the bulk create
+    assert [p["id"] for p in response.json()["projects"]] == sorted([project_id, projects["Project 4"]],
+                                                                    reverse=True)
+
+    response = test_app_with_db.delete(f"/api/workspaces/projects/{project_id}/members/projmember",
+                                       headers=auth_headers())
+
+    assert response.status_code == 204
+
+    response = test_app_with_db.delete(f"/api/workspaces/projects/{project_id}/members/projmember",
+                                       headers=auth_headers())
+
+    assert response.status_code == 404
+
+
+def test_project_creation_unknown_member(test_app_with_db):
+    new_project = {
+        "project_name": "Project 6",
+        "project_summary": "Summary of project 6",
+        "members": ["nosuchuser"]
+    }
+    response = test_app_with_db.post("/api/workspaces/projects/new", data=json.dumps(new_project),
+                                     headers=auth_headers())
+
+    assert response.status_code == 400
+
+
+###############################################################################
+# Test DELETE Requests
+###############################################################################
+def test_projects_deletion(test_app_with_db):
+    response = test_app_with_db.get("/api/workspaces/projects?limit=200", headers=auth_headers())
+    for project in response.json()["projects"]:
+        response = test_app_with_db.delete(f"/api/workspaces/projects/{project['id']}", headers=auth_headers())
+
+        assert response.status_code == 204
+
+
+def test_projects_account_deletion(test_app_with_db):
+    response = test_app_with_db.delete("/api/account/projtest", headers=auth_headers())
+
+    assert response.status_code == 204
+
+    response = test_app_with_db.delete("/api/account/projmember", headers=auth_headers("projmember"))
+
+    assert response.status_code == 204
@@ -0,0 +1,170 @@
+# Imports
+import asyncio
+import json
+import os
+import time
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.testclient import TestClient
+# Custom Imports
+from example_com.app import create_app
+from example_com.config import get_settings
+from example_com.data import db_session
+from example_com.data.migrate import run_migrations
+from example_com.infrastructure import principal_cache
+from example_com.infrastructure.jwt_token_auth import set_token
+
+# A second database standing in for a replica, nothing copies the primary's writes to it
+REPLICA_URL = os.environ.get("TEST_DATABASE_REPLICA_URL")
+USERNAME = "pytest-replica"
+NEW_USERNAME = "pytest-replica-new"
+
+pytestmark = pytest.mark.skipif(not REPLICA_URL, reason="TEST_DATABASE_REPLICA_URL is not set")
+
+
+async def execute(url: str, statement: str, **params):
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.execute(text(statement), params)
+    await engine.dispose()
+
+
+async def copy_user(first_name: str):
+    """ Copy the user from the primary to the replica under another first name, as a lagging replica would """
+    primary = create_async_engine(os.environ.get("DATABASE_URL"))
+    async with primary.connect() as conn:
+        result = await conn.execute(text("SELECT * FROM users WHERE username = :username"), {"username": USERNAME})
+        row = dict(result.mappings().one())
+    await primary.dispose()
+
+    row["first_name"] = first_name
+    columns = ", ".join(row)
+    values = ", ".join(f":{column}" for column in row)
+    await execute(REPLICA_URL, f"INSERT INTO users ({columns}) VALUES ({values})", **row)
+
+
+def delete_users():
+    for url in [os.environ.get("DATABASE_URL"), REPLICA_URL]:
+        asyncio.run(execute(url, "DELETE FROM users WHERE username IN (:username, :new_username)",
+                            username=USERNAME, new_username=NEW_USERNAME))
+
+
+@pytest.fixture(scope="module")
+def test_app_with_replica():
+    # Setup
+    saved = {name: os.environ.get(name) for name in ("DATABASE_REPLICA_URLS", "READ_YOUR_WRITES_WINDOW")}
+    os.environ["DATABASE_REPLICA_URLS"] = REPLICA_URL
+    os.environ["READ_YOUR_WRITES_WINDOW"] = "1"
+    get_settings.cache_clear()
+    asyncio.run(run_migrations(os.environ.get("DATABASE_URL")))
+    asyncio.run(run_migrations(REPLICA_URL))
+    delete_users()
+    with TestClient(create_app()) as test_client:
+
+        # Testing
+        yield test_client
+
+    # Tear Down
+    delete_users()
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    get_settings.cache_clear()
+
+
+###############################################################################
+# Test Read Replicas
+###############################################################################
+def test_reads_follow_the_replica_unless_the_user_just_wrote(test_app_with_replica):
+    new_user = {
+        "first_name": "Primary",
+        "last_name": "McPythonson",
+        "username": USERNAME,
+        "email": "pytest-replica@example.com",
+        "password": "fixtuREz2p@ss"
+    }
+    response = test_app_with_replica.post("/api/account/register", data=json.dumps(new_user))
+
+    assert response.status_code == 201
+
+    asyncio.run(copy_user("Replica"))
+    headers = {
+        "Authorization": f"Bearer {set_token(USERNAME)}",
+        "Cache-Control": "no-store"
+    }
+
+    # Once the window opened by registering closed, reads go to the replica
+    time.sleep(1.2)
+    response = test_app_with_replica.get("/api/account", headers=headers)
+
+    assert response.json()["first_name"] == "Replica"
+
+    response = test_app_with_replica.put(f"/api/account/{USERNAME}", headers=headers,
+                                         data=json.dumps({"first_name": "Written", "last_name": "McPythonson"}))
+
+    assert response.status_code == 200
+
+    # Within the window the user reads their own write from the primary, cached or not
+    assert test_app_with_replica.get("/api/account", headers=headers).json()["first_name"] == "Written"
+    cached_headers = {"Authorization": headers["Authorization"]}
+    assert test_app_with_replica.get("/api/account", headers=cached_headers).json()["first_name"] == "Written"
+
+    # Past the window, reads go back to the replica
+    time.sleep(1.2)
+    principal_cache.evict(USERNAME)
+    response = test_app_with_replica.get("/api/account", headers=headers)
+
+    assert response.json()["first_name"] == "Replica"
+
+
+def test_new_users_read_the_primary_until_the_replica_has_them(test_app_with_replica):
+    new_user = {
+        "first_name": "Primary",
+        "last_name": "McPythonson",
+        "username": NEW_USERNAME,
+        "email": "pytest-replica-new@example.com",
+        "password": "fixtuREz2p@ss"
+    }
+    response = test_app_with_replica.post("/api/account/register", data=json.dumps(new_user))
+
+    assert response.status_code == 201
+
+    # The replica never gets the user, registering alone has to keep their reads on the primary
+    headers = {
+        "Authorization": f"Bearer {set_token(NEW_USERNAME)}",
+        "Cache-Control": "no-store"
+    }
+    response = test_app_with_replica.get("/api/account", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Primary"
+
+    # Logging in opens the window again once it closed
+    time.sleep(1.2)
+    principal_cache.evict(NEW_USERNAME)
+    creds = {"username": NEW_USERNAME, "password": "fixtuREz2p@ss"}
+    response = test_app_with_replica.post("/api/token", data=creds)
+
+    assert response.status_code == 200
+
+    headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    response = test_app_with_replica.get("/api/account", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Primary"
+
+
+def test_replica_pools_are_reported_by_name(test_app_with_replica):
+    name = db_session.replica_name(REPLICA_URL)
+    stats = db_session.pool_stats()
+
+    # The earlier tests read the replica
+    assert list(stats["replicas"]) == [name]
+    assert stats["replicas"][name]["checkouts"] > 0
+    assert REGISTRY.get_sample_value("db_pool_checked_out", {"engine": name}) is not None
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": name}) > 0
+    assert REGISTRY.get_sample_value("db_pool_checked_out", {"engine": "primary"}) is not None
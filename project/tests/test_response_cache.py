@@ -0,0 +1,99 @@
+# Imports
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from fastapi_cache import FastAPICache
+from starlette.requests import Request
+from starlette.responses import Response
+# Custom Imports
+from example_com.infrastructure import redis
+from example_com.infrastructure.cache import FILL_LOCK_KEY, cache, wait_for_entry
+
+calls = {"coalesced": 0, "stale": 0, "conditional": 0}
+
+
+@cache(expire=60, namespace="pytest-coalesced")
+async def coalesced_endpoint(request: Request):
+    calls["coalesced"] += 1
+    await asyncio.sleep(0.3)
+
+    return {"calls": calls["coalesced"]}
+
+
+@cache(expire=1, namespace="pytest-stale", stale_ttl=60)
+async def stale_endpoint(request: Request):
+    calls["stale"] += 1
+
+    return {"calls": calls["stale"]}
+
+
+@cache(expire=60, namespace="pytest-conditional")
+async def conditional_endpoint(request: Request):
+    calls["conditional"] += 1
+
+    return Response(status_code=304)
+
+
+###############################################################################
+# Test Response Cache
+###############################################################################
+def test_cache_coalesces_concurrent_misses(test_app):
+    test_app.app.add_api_route("/pytest/coalesced", coalesced_endpoint)
+    # Redis outlives test runs, a fresh URL starts from a miss
+    url = f"/pytest/coalesced?run={uuid.uuid4().hex}"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: test_app.get(url), range(8)))
+
+    assert [response.status_code for response in responses] == [200] * 8
+    assert {response.json()["calls"] for response in responses} == {1}
+    assert calls["coalesced"] == 1
+
+
+def test_cache_serves_stale_while_revalidating(test_app):
+    test_app.app.add_api_route("/pytest/stale", stale_endpoint)
+    url = f"/pytest/stale?run={uuid.uuid4().hex}"
+
+    assert test_app.get(url).json() == {"calls": 1}
+
+    time.sleep(1.1)
+
+    # Expired, still served while the refresh runs in the background
+    assert test_app.get(url).json() == {"calls": 1}
+
+    time.sleep(0.3)
+
+    assert test_app.get(url).json() == {"calls": 2}
+    assert calls["stale"] == 2
+
+
+def test_cache_waiters_stop_when_the_lock_is_released_without_an_entry(test_app):
+    cache_key = f"pytest-released:{uuid.uuid4().hex}"
+    lock_key = FILL_LOCK_KEY.format(cache_key)
+    # Another replica holds the fill lock and its endpoint answers without storing an entry
+    token = test_app.portal.call(redis.acquire_lock, lock_key, 5_000)
+    waiter = test_app.portal.start_task_soon(wait_for_entry, FastAPICache.get_backend(), cache_key, lock_key)
+    start = time.monotonic()
+
+    time.sleep(0.2)
+    test_app.portal.call(redis.release_lock, lock_key, token)
+
+    assert waiter.result(timeout=5) is None
+    assert time.monotonic() - start < 1
+
+
+def test_cache_conditional_miss_takes_no_fill_lock(test_app, monkeypatch):
+    test_app.app.add_api_route("/pytest/conditional", conditional_endpoint)
+    url = f"/pytest/conditional?run={uuid.uuid4().hex}"
+    locks = []
+
+    async def acquire_lock(key, ttl_ms):
+        locks.append(key)
+
+    monkeypatch.setattr(redis, "acquire_lock", acquire_lock)
+    response = test_app.get(url, headers={"If-None-Match": '"v1"'})
+
+    assert response.status_code == 304
+    assert calls["conditional"] == 1
+    assert locks == []
@@ -0,0 +1,62 @@
+# Imports
+import jwt
+import pytest
+import time
+from datetime import datetime, timedelta
+# Custom Imports
+from example_com.infrastructure import jwt_token_auth
+from example_com.infrastructure.jwt_token_auth import decode_token, set_token, token_cache_stats
+
+
+@pytest.fixture
+def token_cache(monkeypatch):
+    monkeypatch.setattr(jwt_token_auth, "JWT_SECRET", "pytest-secret-one")
+    jwt_token_auth.configure_token_cache(maxsize=10, ttl=300)
+
+    yield
+
+    jwt_token_auth.configure_token_cache(maxsize=10_000, ttl=300)
+
+
+###############################################################################
+# Test Token Cache
+###############################################################################
+def test_token_cache_hit(token_cache):
+    token = set_token("pytest")
+
+    assert decode_token(token) == decode_token(token)
+    assert token_cache_stats()["hits"] == 1
+    assert token_cache_stats()["misses"] == 1
+
+
+def test_token_cache_expiry(token_cache):
+    payload = {
+        'username': "pytest",
+        'exp': datetime.utcnow() + timedelta(seconds=2)
+    }
+    token = jwt.encode(payload, jwt_token_auth.JWT_SECRET, algorithm='HS256')
+
+    assert decode_token(token)["username"] == "pytest"
+
+    time.sleep(2.1)
+
+    with pytest.raises(jwt.exceptions.ExpiredSignatureError):
+        decode_token(token)
+
+
+def test_token_cache_secret_rotation(token_cache, monkeypatch):
+    token = set_token("pytest")
+    decode_token(token)
+
+    monkeypatch.setattr(jwt_token_auth, "JWT_SECRET", "pytest-secret-two")
+
+    with pytest.raises(jwt.exceptions.InvalidSignatureError):
+        decode_token(token)
+
+
+def test_token_cache_bounded(token_cache):
+    for i in range(15):
+        decode_token(set_token(f"pytest{i}"))
+
+    assert token_cache_stats()["size"] == 10
+    assert token_cache_stats()["evictions"] == 5
@@ -0,0 +1,88 @@
+# Imports
+import asyncio
+import json
+from fastapi_cache.backends import Backend
+# Custom Imports
+from example_com.infrastructure.two_tier_cache import TwoTierBackend
+
+
+class DictBackend(Backend):
+    """ Shared tier kept in a dict, counts the reads that reach it """
+
+    def __init__(self):
+        self.entries = {}
+        self.reads = 0
+        self.on_read = None
+
+    async def get_with_ttl(self, key):
+        self.reads += 1
+        if self.on_read:
+            self.on_read()
+
+        return (60, self.entries[key]) if key in self.entries else (-2, None)
+
+    async def get(self, key):
+        return (await self.get_with_ttl(key))[1]
+
+    async def set(self, key, value, expire=None):
+        self.entries[key] = value
+
+    async def clear(self, namespace=None, key=None):
+        return 1 if self.entries.pop(key, None) else 0
+
+
+###############################################################################
+# Test Two Tier Cache
+###############################################################################
+def test_two_tier_cache_l1_hit():
+    l2 = DictBackend()
+    l2.entries["key"] = "value"
+    backend = TwoTierBackend(l2, maxsize=10, ttl=30)
+
+    assert asyncio.run(backend.get("key")) == "value"
+    assert asyncio.run(backend.get("key")) == "value"
+    assert asyncio.run(backend.get("missing")) is None
+
+    assert l2.reads == 2
+    assert backend.stats()["l1"]["hits"] == 1
+    assert backend.stats()["l2"]["hits"] == 1
+    assert backend.stats()["l2"]["misses"] == 1
+
+
+def test_two_tier_cache_invalidation_message():
+    l2 = DictBackend()
+    backend = TwoTierBackend(l2, maxsize=10, ttl=30)
+    asyncio.run(backend.set("key", "old", expire=60))
+
+    # Another worker changed the entry and broadcast its key
+    l2.entries["key"] = "new"
+    backend.on_invalidation(json.dumps(["key"]))
+
+    assert asyncio.run(backend.get("key")) == "new"
+
+
+def test_two_tier_cache_fill_racing_invalidation():
+    l2 = DictBackend()
+    l2.entries["key"] = "old"
+    backend = TwoTierBackend(l2, maxsize=10, ttl=30)
+
+    # The invalidation arrives while the shared tier answers with the old value
+    l2.on_read = lambda: backend.on_invalidation(json.dumps(["key"]))
+    assert asyncio.run(backend.get("key")) == "old"
+
+    l2.on_read = None
+    l2.entries["key"] = "new"
+    assert asyncio.run(backend.get("key")) == "new"
+
+
+def test_two_tier_cache_l1_hit_reports_remaining_ttl():
+    l2 = DictBackend()
+    backend = TwoTierBackend(l2, maxsize=10, ttl=30)
+    asyncio.run(backend.set("stored", "value", expire=10))
+    l2.entries["read"] = "value"
+    asyncio.run(backend.get("read"))
+
+    # The L2 entries' remaining lifetime, not the L1 lifetime
+    assert asyncio.run(backend.get_with_ttl("stored")) in [(9, "value"), (10, "value")]
+    assert asyncio.run(backend.get_with_ttl("read")) in [(59, "value"), (60, "value")]
+    assert backend.stats()["l1"]["hits"] == 2